@@ -0,0 +1,64 @@
+"""
+Benchmark of ``Sqlite.read`` engines on a wide table
+
+usage::
+
+    python benchmarks/sqlite_read.py --rows 200000 --columns 40
+
+"""
+import argparse
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from ozcore import core
+
+
+def build(path, rows, columns):
+    """a wide table of integer, float and text columns"""
+    rng = np.random.default_rng(99)
+    data = {}
+    for i in range(columns):
+        if i % 3 == 0:
+            data[f"i{i}"] = rng.integers(0, 1_000_000, rows)
+        elif i % 3 == 1:
+            data[f"f{i}"] = rng.random(rows)
+        else:
+            data[f"s{i}"] = rng.integers(0, 1000, rows).astype(str)
+    with sqlite3.connect(path) as conn:
+        pd.DataFrame(data).to_sql("wide", conn, index=False)
+
+
+def timeit(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--columns", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.db"
+        build(path, args.rows, args.columns)
+        sql = core.sql(path)
+
+        print(f"{args.rows} rows x {args.columns} columns, best of {args.repeat}")
+        for engine in sql.READ_ENGINES:
+            elapsed = timeit(lambda: sql.read("wide", engine=engine), args.repeat)
+            print(f"{engine:>12}: {elapsed:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+""" analytic queries over sqlite databases and DataFrames with DuckDB """
+
+import logging
+import re
+import time
+
+from ozcore import core
+
+# monotonic time of the last failed load of duckdb's sqlite extension (e.g. offline),
+# loading is not tried again for RETRY_AFTER seconds
+_EXTENSION_FAILED = None
+RETRY_AFTER = 300
+
+
+class Analytic:
+    """
+    Vectorized, multi-threaded SQL with DuckDB
+
+    The database file is attached read-only to an in-process DuckDB
+    connection, so group-bys, window functions and joins run on DuckDB's
+    columnar engine instead of sqlite. DataFrames given as keyword arguments
+    are queried in place, without copying them into the database.
+
+    usage::
+
+        sql.analyze("SELECT col1, SUM(col4) FROM df1 GROUP BY col1")
+
+        sql.analyze(
+            "SELECT t.*, f.score FROM df1 t JOIN scores f USING (col1)",
+            scores=scores_df,
+        )
+
+    note:
+        duckdb is an optional dependency, ``pip install duckdb``
+    """
+
+    def analyze(self, query, params=None, threads=None, **frames):
+        """
+        run an analytic query with DuckDB
+
+        parameters:
+            query: str, DuckDB SQL, tables referred by name
+            params: list|dict, default None, values of ``?``, ``$1`` or ``$name`` parameters
+            threads: int, default None, DuckDB threads (all cores if None)
+            frames: DataFrames to query by their keyword names
+
+        returns:
+            DataFrame
+
+        note:
+            * the database is attached with DuckDB's sqlite extension, if the extension
+              can not be loaded (e.g. offline) the tables in query are read into DataFrames instead
+            * in memory mode (see ``load_into_memory``) tables are always read into DataFrames
+        """
+        if not core.utils.check_modules("duckdb"):
+            raise Exception("duckdb is required for analyze! Please pip install duckdb")
+        import duckdb
+
+        con = duckdb.connect()
+        try:
+            if threads is not None:
+                con.execute(f"SET threads = {int(threads)}")
+
+            if self.in_memory or not self._attach(con):
+                for table_name in self._tables_in(query):
+                    if table_name not in frames:
+                        con.register(table_name, self.read(table_name, engine="native"))
+
+            for name, df in frames.items():
+                con.register(name, df)
+
+            return con.execute(query, params).df()
+        finally:
+            con.close()
+
+    def _attach(self, con):
+        """
+        attach the database read-only and make it the default catalog
+
+        returns:
+            True if attached, False if the sqlite extension can not be loaded
+        """
+        if not self._load_extension(con):
+            return False
+
+        path = str(self.path_to_database).replace("'", "''")
+        con.execute(f"ATTACH '{path}' AS ozcore_db (TYPE sqlite, READ_ONLY)")
+        con.execute("USE ozcore_db")
+        return True
+
+    @staticmethod
+    def _load_extension(con):
+        """
+        install and load duckdb's sqlite extension
+
+        returns:
+            True if loaded, a failure is remembered for RETRY_AFTER seconds
+        """
+        import duckdb
+
+        global _EXTENSION_FAILED
+        if _EXTENSION_FAILED is not None and time.monotonic() - _EXTENSION_FAILED < RETRY_AFTER:
+            return False
+
+        try:
+            con.execute("INSTALL sqlite")
+            con.execute("LOAD sqlite")
+        except duckdb.Error as e:
+            _EXTENSION_FAILED = time.monotonic()
+            logging.warning(f"sqlite extension of duckdb is not available, tables are read: {e}")
+            return False
+        _EXTENSION_FAILED = None
+        return True
+
+    def _tables_in(self, query):
+        """tables of the database whose names appear in query"""
+        return [
+            table_name
+            for table_name in self.schema.table_names
+            if re.search(rf"(?<![\w.]){re.escape(table_name)}\b", query, re.IGNORECASE)
+        ]
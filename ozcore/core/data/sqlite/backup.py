@@ -0,0 +1,101 @@
+""" online backups of sqlite databases """
+
+import logging
+import sqlite3
+from pathlib import Path
+from zipfile import ZIP_DEFLATED, ZipFile
+
+from ozcore import core
+
+
+class Backup:
+    """
+    Consistent snapshots of a live database with the sqlite3 backup API
+
+    Pages are copied in steps, the source is locked only during a step, so
+    writers get a chance between steps. A write from another connection
+    restarts the copy, the result is always a consistent snapshot.
+
+    usage::
+
+        sql.backup("backups/")  # Backup_<now>_<name>.db in backups/
+
+        sql.backup("copy.db", pages_per_step=4096, sleep=0.01, compress=True)
+        # copy.zip
+
+    hint:
+        ``core.utils.backup`` zips files as they are, use this one for live databases.
+    """
+
+    def backup(
+        self,
+        dest,
+        pages_per_step: int = 1024,
+        sleep: float = 0.005,
+        progress=None,
+        compress: bool = False,
+        verbose: bool = True,
+    ):
+        """
+        copy the database into a new sqlite file
+
+        parameters:
+            dest: str|Path, a file path or an existing folder for ``Backup_<now>_<name>.<ext>``
+            pages_per_step: int, default 1024, pages copied per step, -1 for all at once
+            sleep: float, default 0.005, seconds to wait between steps
+            progress: callable, default None, called as ``progress(remaining, total)`` after each step
+            compress: bool, default False, zip the backup and remove the sqlite file
+            verbose: bool, default True, logging the result
+
+        returns:
+            Path of the backup file (or the zip file if compress)
+        """
+        src_path = self.path_to_database
+        dest = Path(dest).absolute()
+        if dest.is_dir():
+            dest = dest.joinpath(
+                "Backup_" + core.utils.now_prefix("_") + "_" + src_path.stem + src_path.suffix
+            )
+        if dest.exists():
+            raise Exception(f"{dest} already exists!")
+
+        def _progress(status, remaining, total):
+            if progress is not None:
+                progress(remaining, total)
+
+        self._copy_database(self.engine, dest, pages_per_step, sleep, _progress)
+
+        if compress:
+            zipped = dest.with_suffix(".zip")
+            with ZipFile(zipped, "w", ZIP_DEFLATED, compresslevel=9) as thezip:
+                thezip.write(dest, arcname=dest.name)
+            dest.unlink()
+            dest = zipped
+
+        if verbose:
+            logging.warning(f"{src_path.name} is backed up in {dest}")
+
+        return dest
+
+    @staticmethod
+    def _copy_database(engine, dest, pages_per_step=-1, sleep=0.005, progress=None):
+        """
+        copy the database of an engine into a file or a sqlite3 connection
+
+        parameters:
+            engine: sqlalchemy engine, the source
+            dest: Path or sqlite3.Connection
+            pages_per_step: int, default -1, all pages at once
+            sleep: float, default 0.005
+            progress: callable, default None, sqlite3 backup progress callback
+        """
+        src = engine.raw_connection()
+        target = dest if isinstance(dest, sqlite3.Connection) else sqlite3.connect(dest)
+        try:
+            src.driver_connection.backup(
+                target, pages=pages_per_step, progress=progress, sleep=sleep
+            )
+        finally:
+            if target is not dest:
+                target.close()
+            src.close()
@@ -0,0 +1,148 @@
+""" result cache for sqlite reads """
+
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import pandas as pd
+
+
+class ResultCache:
+    """
+    LRU cache of read results, invalidated when the database changes
+
+    Every lookup compares ``PRAGMA data_version`` of a dedicated connection and
+    the modification times of the database and its WAL file. Any commit, from
+    this process or another one, changes one of them and drops all entries.
+
+    parameters:
+        path: path to the sqlite file
+        max_bytes: int, default 256 MiB, memory cap of the cached DataFrames
+
+    usage::
+
+        sql.enable_cache(max_bytes=64 * 2**20)
+
+        sql.read("lookup_table")  # from disk
+        sql.read("lookup_table")  # from memory
+
+        sql.cache.stats
+        # {'hits': 1, 'misses': 1, 'evictions': 0, 'entries': 1, 'bytes': ...}
+
+    """
+
+    def __init__(self, path, max_bytes: int = 256 * 2**20):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key: (DataFrame, size)
+        self._bytes = 0
+        self._token = None
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+
+    def _current_token(self) -> tuple:
+        data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        mtimes = []
+        for path in (self.path, Path(str(self.path) + "-wal")):
+            try:
+                mtimes.append(os.stat(path).st_mtime_ns)
+            except FileNotFoundError:
+                mtimes.append(None)
+        return (data_version, *mtimes)
+
+    def _revalidate(self):
+        token = self._current_token()
+        if token != self._token:
+            self._entries.clear()
+            self._bytes = 0
+            self._token = token
+
+    def get(self, key):
+        """
+        cached DataFrame of a key
+
+        parameters:
+            key: hashable
+
+        returns:
+            a copy of the cached DataFrame or None
+        """
+        with self._lock:
+            self._revalidate()
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key][0].copy()
+
+    @property
+    def token(self) -> tuple:
+        """
+        database state at the last lookup, pass it to ``put`` with the result read after
+        """
+        return self._token
+
+    def put(self, key, df: pd.DataFrame, token: tuple = None):
+        """
+        cache a DataFrame, evicts least recently used entries over max_bytes
+
+        parameters:
+            key: hashable
+            df: DataFrame
+            token: tuple, default None, database state before df was read,
+                df is not cached if the database has changed since then
+        """
+        size = int(df.memory_usage(deep=True).sum())
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            self._revalidate()
+            if token is not None and token != self._token:
+                return
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (df.copy(), size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+
+    def clear(self):
+        """
+        drop all entries
+        """
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def close(self):
+        """
+        drop all entries and close the data_version connection
+        """
+        self.clear()
+        self._conn.close()
+
+    @property
+    def stats(self) -> dict:
+        """
+        hit, miss and memory statistics
+
+        returns:
+            dict
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
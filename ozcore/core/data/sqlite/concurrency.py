@@ -0,0 +1,199 @@
+""" concurrent writers on a sqlite file: immediate transactions, busy timeout and retries """
+
+import contextlib
+import logging
+import random
+import sqlite3
+import threading
+import time
+
+import sqlalchemy as sa
+
+# connection info flag, the next transaction of the connection begins IMMEDIATE
+IMMEDIATE = "ozcore_immediate"
+
+
+def immediate_transactions(engine: sa.engine.Engine):
+    """
+    begin transactions explicitly, ``BEGIN IMMEDIATE`` for connections flagged as writers
+
+    parameters:
+        engine: sqlalchemy engine
+
+    note:
+        pysqlite's implicit BEGIN (deferred, before the first write only) is turned off.
+        A deferred transaction upgrading to a write lock fails at once with "database is locked"
+        when another writer is active, the busy timeout is not applied to it.
+    """
+
+    @sa.event.listens_for(engine, "connect")
+    def _driver_autocommit(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @sa.event.listens_for(engine, "begin")
+    def _begin(conn):
+        conn.exec_driver_sql("BEGIN IMMEDIATE" if conn.info.get(IMMEDIATE) else "BEGIN")
+
+
+def wal_journal(engine: sa.engine.Engine):
+    """
+    switch the file to the WAL journal on every new connection of an engine
+
+    parameters:
+        engine: sqlalchemy engine
+
+    note:
+        In WAL readers never wait for a writer, only writers wait for each other. In the rollback
+        journal, the reads every write does first (e.g. the schema check) fail with
+        "database is locked" once busy_timeout runs out. The switch is persistent; if the file
+        is locked by another writer, it is tried again on the next connection.
+    """
+
+    @sa.event.listens_for(engine, "connect")
+    def _wal(dbapi_connection, connection_record):
+        try:
+            dbapi_connection.execute("PRAGMA journal_mode=WAL")
+        except sqlite3.OperationalError as e:
+            if "locked" not in str(e):
+                raise
+            logging.warning(f"journal_mode is not switched to WAL, the file is locked: {e}")
+
+
+@contextlib.contextmanager
+def write_transaction(engine: sa.engine.Engine):
+    """
+    a write transaction begun explicitly with ``BEGIN IMMEDIATE``, committed on exit, rolled back on error
+
+    parameters:
+        engine: sqlalchemy engine
+
+    returns:
+        context manager of a Connection
+
+    note:
+        pysqlite begins a transaction implicitly only before INSERT, UPDATE, DELETE and REPLACE.
+        Without an explicit BEGIN, DDL such as ``DROP TABLE`` would be committed on its own.
+    """
+    with engine.begin() as conn:
+        if not conn.connection.driver_connection.in_transaction:
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+        yield conn
+
+
+def is_locked(error: Exception) -> bool:
+    """
+    True if error is sqlite's "database is locked" or "database table is locked"
+    """
+    return isinstance(error, sa.exc.OperationalError) and "locked" in str(error.orig)
+
+
+class Concurrency:
+    """
+    Write transactions for many writers (threads or processes) on a file
+
+    Writers begin with ``BEGIN IMMEDIATE``, so they take the write lock before
+    reading anything and wait for it up to busy_timeout. If the lock is still
+    held, the begin is retried with exponential backoff and jitter.
+
+    parameters:
+        busy_timeout: int, default 5000, ms sqlite waits for a lock before giving up
+        retries: int, default 10, retries of a begin after busy_timeout
+        backoff: float, default 0.01, seconds to sleep before the first retry, doubled at each retry
+        max_backoff: float, default 1.0, the longest sleep between retries
+
+    usage::
+
+        sql = core.sql(path, busy_timeout=5000)
+        # or
+        sql.enable_concurrency(busy_timeout=5000, retries=10)
+
+        sql.concurrency.metrics
+        # {'transactions': 120, 'retries': 3, 'failures': 0, 'lock_wait': 1.52, 'max_lock_wait': 0.31}
+
+    """
+
+    def __init__(
+        self,
+        busy_timeout: int = 5000,
+        retries: int = 10,
+        backoff: float = 0.01,
+        max_backoff: float = 1.0,
+    ):
+        self.busy_timeout = busy_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """
+        zero the metrics
+        """
+        with self._lock:
+            self._metrics = {
+                "transactions": 0,
+                "retries": 0,
+                "failures": 0,
+                "lock_wait": 0.0,
+                "max_lock_wait": 0.0,
+            }
+
+    @property
+    def metrics(self) -> dict:
+        """
+        write transaction metrics
+
+        returns:
+            dict of transactions, retries, failures (begins given up),
+            lock_wait (total seconds waited for the write lock) and max_lock_wait
+        """
+        with self._lock:
+            return dict(self._metrics)
+
+    def _record(self, wait, retries, failed=False):
+        with self._lock:
+            self._metrics["transactions"] += not failed
+            self._metrics["failures"] += failed
+            self._metrics["retries"] += retries
+            self._metrics["lock_wait"] += wait
+            self._metrics["max_lock_wait"] = max(self._metrics["max_lock_wait"], wait)
+
+    def _sleep(self, attempt):
+        delay = min(self.max_backoff, self.backoff * 2**attempt)
+        time.sleep(delay * random.uniform(0.5, 1.5))
+
+    @contextlib.contextmanager
+    def begin(self, engine: sa.engine.Engine):
+        """
+        a write transaction, committed on exit, rolled back on error
+
+        parameters:
+            engine: sqlalchemy engine with ``immediate_transactions``
+
+        returns:
+            context manager of a Connection
+        """
+        start = time.perf_counter()
+        attempt = 0
+        while True:
+            conn = engine.connect()
+            conn.info[IMMEDIATE] = True
+            try:
+                trans = conn.begin()
+            except sa.exc.OperationalError as e:
+                conn.info.pop(IMMEDIATE, None)
+                conn.close()
+                if not is_locked(e) or attempt >= self.retries:
+                    self._record(time.perf_counter() - start, attempt, failed=True)
+                    raise
+                self._sleep(attempt)
+                attempt += 1
+                continue
+            conn.info.pop(IMMEDIATE, None)
+            break
+
+        self._record(time.perf_counter() - start, attempt)
+        with conn:
+            with trans:
+                yield conn
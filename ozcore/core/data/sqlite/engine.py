@@ -0,0 +1,129 @@
+""" sqlite engine factory with PRAGMA profiles """
+
+import threading
+from pathlib import Path
+
+import sqlalchemy as sa
+
+from .concurrency import immediate_transactions, wal_journal
+
+# PRAGMA profiles applied on every new DBAPI connection
+# cache_size is negative for KiB, mmap_size in bytes, busy_timeout in ms
+PROFILES = {
+    "safe": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "busy_timeout": 5000,
+    },
+    "fast-read": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 268_435_456,  # 256 MiB
+        "cache_size": -262_144,  # 256 MiB
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+    "bulk-load": {
+        "journal_mode": "WAL",
+        "synchronous": "OFF",
+        "mmap_size": 268_435_456,  # 256 MiB
+        "cache_size": -524_288,  # 512 MiB
+        "temp_store": "MEMORY",
+        "busy_timeout": 30000,
+    },
+}
+
+# engines reused per (resolved path, profile, concurrency mode)
+_ENGINES = {}
+_ENGINES_LOCK = threading.Lock()
+
+
+def profile_pragmas(profile) -> dict:
+    """
+    PRAGMAs of a profile
+
+    parameters:
+        profile: str|dict|None, a name in PROFILES, a dict of PRAGMAs or None for sqlite defaults
+
+    returns:
+        dict of PRAGMA names and values
+    """
+    if profile is None:
+        return {}
+    elif isinstance(profile, dict):
+        return dict(profile)
+    elif profile not in PROFILES:
+        raise Exception(f"Unknown profile {profile}! Available: {list(PROFILES)}")
+    return dict(PROFILES[profile])
+
+
+def apply_pragmas(engine: sa.engine.Engine, pragmas: dict):
+    """
+    apply PRAGMAs on every new connection of an engine with a connect-event listener
+
+    parameters:
+        engine: sqlalchemy engine
+        pragmas: dict of PRAGMA names and values
+    """
+    if not pragmas:
+        return
+
+    @sa.event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def get_engine(path: Path, profile=None, busy_timeout: int = None) -> sa.engine.Engine:
+    """
+    an engine for a sqlite file, reused for the same resolved path and profile
+
+    parameters:
+        path: Path, absolute path to an existing sqlite file
+        profile: str|dict|None, see ``profile_pragmas``
+        busy_timeout: int, default None, ms to wait for locks, enables ``immediate_transactions``
+            and the WAL journal unless the profile sets journal_mode
+
+    returns:
+        Engine object
+
+    note:
+        If the file is replaced (a new inode), the previous engine is disposed and a new one created.
+    """
+    pragmas = profile_pragmas(profile)
+    if busy_timeout is not None:
+        pragmas["busy_timeout"] = int(busy_timeout)
+    key = (
+        str(Path(path).resolve()),
+        tuple(sorted(pragmas.items())),
+        busy_timeout is not None,
+    )
+    inode = Path(path).stat().st_ino
+
+    with _ENGINES_LOCK:
+        engine, engine_inode = _ENGINES.get(key, (None, None))
+        if engine is not None and engine_inode == inode:
+            return engine
+        if engine is not None:
+            engine.dispose()
+
+        engine = sa.create_engine("sqlite:///" + str(path), echo=False)
+        apply_pragmas(engine, pragmas)
+        if busy_timeout is not None:
+            immediate_transactions(engine)
+            if "journal_mode" not in pragmas:
+                wal_journal(engine)
+        _ENGINES[key] = (engine, inode)
+        return engine
+
+
+def dispose_engines():
+    """
+    dispose and forget every reused engine
+    """
+    with _ENGINES_LOCK:
+        for engine, _ in _ENGINES.values():
+            engine.dispose()
+        _ENGINES.clear()
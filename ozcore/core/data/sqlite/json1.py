@@ -0,0 +1,122 @@
+""" flattening JSON columns of sqlite tables with the JSON1 functions """
+
+import enum
+import re
+
+import sqlalchemy as sa
+
+from .native import read_native
+
+
+def path_name(path: str) -> str:
+    """
+    a column name of a JSON path
+
+    parameters:
+        path: str, e.g. ``"$.user.name"``, ``"$.tags[0]"``
+
+    returns:
+        str, e.g. ``"user_name"``, ``"tags_0"``
+    """
+    return re.sub(r"\W+", "_", re.sub(r"^\$\.?", "", path)).strip("_") or "value"
+
+
+class Json:
+    """
+    JSON text columns flattened inside sqlite
+
+    ``json_extract`` picks values by path, ``json_each`` joins the elements of
+    an array as rows. Values come back with their JSON types (integer, real,
+    text), nested objects and arrays as JSON text.
+
+    usage::
+
+        sql.json_extract_columns("events", "payload", ["$.user.id", "$.user.name"])
+        # columns of events and user_id, user_name
+
+        sql.json_extract_columns(
+            "orders", "payload", {"sku": "$.sku", "qty": "$.qty"}, each="$.items"
+        )
+        # a record per item of each order
+
+    note:
+        Values should be valid JSON (e.g. ``json.dumps``), python reprs with single
+        quotes as handled by ``core.utils.serialize_a_json_field`` are not. Invalid values give NULLs.
+    """
+
+    def json_extract_columns(
+        self,
+        table_name,
+        column,
+        paths,
+        columns=None,
+        each=None,
+        where=None,
+        params=None,
+        chunksize=None,
+    ):
+        """
+        read a table with values of a JSON column as columns
+
+        parameters:
+            table_name: str|enum
+            column: str, JSON text column
+            paths: list|dict, JSON paths or dict of column name and JSON path
+            columns: list, default None, table columns to keep (all but column if None)
+            each: str, default None, path of an array, a record per element with paths relative to the element
+            where: str, default None, SQL filter with named parameters, table columns as ``t.col``
+            params: dict, default None, values of the named parameters in where
+            chunksize: int, default None, yield DataFrames of chunksize rows
+
+        returns:
+            * a DataFrame
+            * an iterator of DataFrames if chunksize is given
+
+        note:
+            column names of path lists are derived from the paths, see ``path_name``
+        """
+        if isinstance(table_name, enum.Enum):
+            table_name = table_name.name
+        if isinstance(paths, str):
+            paths = [paths]
+        if not isinstance(paths, dict):
+            paths = {path_name(path): path for path in paths}
+
+        if not self.table_exists(table_name):
+            raise Exception("table name not found in the database!")
+        if columns is None:
+            columns = [col.name for col in self.columns(table_name) if col.name != column]
+        missing = [col for col in [column, *columns] if not self.column_exists(table_name, col)]
+        if missing:
+            raise Exception(f"{missing} not found in {table_name}!")
+
+        q = self._quote
+        doc = f"t.{q(column)}"
+        binds = {f"_ozcore_path_{i}": path for i, path in enumerate(paths.values())}
+
+        selects = [f"t.{q(col)}" for col in columns]
+        source = f"{q(table_name)} AS t"
+        if each is None:
+            for name, bind in zip(paths, binds):
+                selects.append(
+                    f"CASE WHEN json_valid({doc}) THEN json_extract({doc}, :{bind}) END AS {q(name)}"
+                )
+        else:
+            binds["_ozcore_each"] = each
+            source += (
+                f", json_each(CASE WHEN json_valid({doc}) THEN {doc} ELSE '[]' END, "
+                ":_ozcore_each) AS j"
+            )
+            # scalar elements are only reachable with the path "$"
+            for name, bind in zip(paths, binds):
+                selects.append(
+                    f"CASE WHEN j.type IN ('object', 'array') THEN json_extract(j.value, :{bind}) "
+                    f"WHEN :{bind} = '$' THEN j.value END AS {q(name)}"
+                )
+
+        sql = f"SELECT {', '.join(selects)} FROM {source}"
+        if where is not None:
+            sql += f" WHERE ({where})"
+
+        stmt = sa.text(sql)
+        return read_native(self.engine, stmt, {**binds, **(params or {})}, chunksize=chunksize)
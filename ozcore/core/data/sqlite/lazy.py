@@ -0,0 +1,62 @@
+""" lazy Ibis expressions over sqlite tables """
+
+import enum
+
+from ozcore import core
+
+
+class Lazy:
+    """
+    Lazy table expressions with Ibis
+
+    Filters, projections and aggregations on the expression compile to SQL and
+    run in sqlite, only the result is materialized on ``.execute()``.
+
+    usage::
+
+        t = sql.table("df1")
+        expr = t.filter(t.col2 > 2).group_by("col1").aggregate(total=t.col4.sum())
+
+        expr.compile()  # the SQL
+        expr.execute()  # DataFrame
+
+    note:
+        ibis-framework is an optional dependency, ``pip install ibis-framework[sqlite]``
+    """
+
+    _ibis_backend = None
+
+    @property
+    def ibis(self):
+        """
+        Ibis sqlite backend of the current database, created at first use
+
+        returns:
+            ibis sqlite Backend
+        """
+        if not core.utils.check_modules("ibis"):
+            raise Exception("ibis is required! Please pip install ibis-framework[sqlite]")
+        if self.in_memory:
+            raise Exception("Database is loaded into memory! Please unload() first")
+        import ibis
+
+        path = self.path_to_database
+        if self._ibis_backend is None or self._ibis_backend[0] != path:
+            self._ibis_backend = (path, ibis.sqlite.connect(str(path)))
+        return self._ibis_backend[1]
+
+    def table(self, table_name):
+        """
+        a lazy Ibis table expression
+
+        parameters:
+            table_name: str|enum
+
+        returns:
+            ibis Table expression, nothing is read until ``.execute()``
+        """
+        if isinstance(table_name, enum.Enum):
+            table_name = table_name.name
+        if not self.table_exists(table_name):
+            raise Exception("table name not found in the database!")
+        return self.ibis.table(table_name)
@@ -0,0 +1,144 @@
+""" in-memory mirror of sqlite databases """
+
+import logging
+import sqlite3
+import threading
+import uuid
+
+import sqlalchemy as sa
+
+
+def memory_engine(name: str) -> sa.engine.Engine:
+    """
+    an engine on a shared-cache memory database, usable from any thread
+
+    parameters:
+        name: str, URI of the memory database
+
+    returns:
+        Engine object
+
+    note:
+        Shared-cache table locks fail at once with "database table is locked", the busy
+        timeout does not apply to them. So connections are used by one thread at a time:
+        a thread checking out a connection waits until other threads check theirs in.
+        A thread may hold several connections at once.
+    """
+    engine = sa.create_engine(
+        f"sqlite:///{name}&uri=true",
+        connect_args={"check_same_thread": False},
+        poolclass=sa.pool.QueuePool,
+        max_overflow=-1,
+        echo=False,
+    )
+    lock = threading.RLock()
+
+    @sa.event.listens_for(engine, "checkout")
+    def _acquire(dbapi_connection, connection_record, connection_proxy):
+        lock.acquire()
+
+    @sa.event.listens_for(engine, "checkin")
+    def _release(dbapi_connection, connection_record):
+        lock.release()
+
+    return engine
+
+
+class Memory:
+    """
+    Works on a shared-cache ``:memory:`` copy of the database and writes it back on demand
+
+    After ``load_into_memory`` every method of the instance runs on the memory
+    engine. ``flush`` writes the memory database back to the file with the
+    backup API, ``unload`` flushes and switches back to the file engine.
+
+    usage::
+
+        sql.load_into_memory()
+
+        sql.read(...)
+        sql.sa_update_a_record(...)
+
+        sql.flush()  # one disk write
+        sql.unload()
+
+    warning:
+        * Changes made on the file by others while mirrored are overwritten by ``flush``.
+        * Threads (e.g. ``read_many``, ``writer``) take turns on the memory database, see ``memory_engine``.
+    """
+
+    _disk_engine = None
+    _memory_anchor = None
+
+    @property
+    def in_memory(self) -> bool:
+        """
+        True if the instance works on the memory mirror
+        """
+        return self._disk_engine is not None
+
+    def load_into_memory(self):
+        """
+        copy the database into a shared-cache memory database and use it as engine
+
+        returns:
+            memory Engine object
+        """
+        if self.in_memory:
+            return self.engine
+
+        if self.cache is not None:
+            logging.warning("result cache is disabled in memory mode")
+            self.disable_cache()
+
+        name = f"file:ozcore_{uuid.uuid4().hex}?mode=memory&cache=shared"
+        # the memory database lives as long as one connection is open
+        anchor = sqlite3.connect(name, uri=True, check_same_thread=False)
+        self._copy_database(self.engine, anchor)
+
+        self._memory_anchor = anchor
+        self._disk_engine = self.engine
+        self._swap_engine(memory_engine(name))
+        return self.engine
+
+    def flush(self, pages_per_step: int = -1, sleep: float = 0.005):
+        """
+        write the memory database back to the file
+
+        parameters:
+            pages_per_step: int, default -1, all pages at once
+            sleep: float, default 0.005, seconds to wait between steps
+
+        returns:
+            True
+        """
+        if not self.in_memory:
+            raise Exception("Database is not loaded into memory! Please load_into_memory()")
+
+        with self._disk_engine.connect() as conn:
+            target = conn.connection.driver_connection
+            self._copy_database(self.engine, target, pages_per_step, sleep)
+        return True
+
+    def unload(self, flush: bool = True):
+        """
+        switch back to the file engine and release the memory database
+
+        parameters:
+            flush: bool, default True, write the changes back before unloading
+
+        returns:
+            file Engine object
+        """
+        if not self.in_memory:
+            return self.engine
+
+        if flush:
+            self.flush()
+
+        self.engine.dispose()
+        self._memory_anchor.close()
+        self._swap_engine(self._disk_engine)
+        self._disk_engine = None
+        self._memory_anchor = None
+        return self.engine
@@ -0,0 +1,390 @@
+""" batched schema migrations for sqlite tables """
+
+import logging
+import re
+import time
+
+import alembic
+import sqlalchemy as sa
+
+from ozcore import core
+
+# rows copied per transaction in online mode
+CHUNKSIZE = 50_000
+
+
+class Alter:
+    """
+    Collects column operations on a table and applies them with a single table rebuild
+
+    SQLite can not drop or retype a column in place, each of these operations
+    copies the whole table. Alter collects the operations and applies them
+    in one alembic ``batch_alter_table``, so the table is copied only once.
+
+    parameters:
+        orm: Sqlite instance having the engine
+        table_name: str
+        verbose: bool, default True, logging progress and timing
+
+    usage::
+
+        with sql.alter("table_name") as t:
+            t.add("new_column", sa.INTEGER)
+            t.drop("old_column")
+            t.retype("col2", sa.TEXT)
+
+        # or without a context
+        t = sql.alter("table_name")
+        t.drop("old_column").retype("col2", sa.TEXT)
+        t.apply()
+
+        # huge tables, copied in chunks while readers and writers go on
+        t.retype("col2", sa.TEXT).apply(online=True, progress=True)
+
+    """
+
+    def __init__(self, orm, table_name: str, verbose: bool = True):
+        if isinstance(table_name, sa.sql.schema.Table):
+            table_name = table_name.name
+        if not orm.table_exists(table_name):
+            raise Exception(f"{table_name} does not exists in this database!")
+
+        self.orm = orm
+        self.table_name = table_name
+        self.verbose = verbose
+        self.operations = []
+        self.elapsed = None
+        self._columns = list(orm.columns(table_name).__members__)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # operations are discarded if an exception raised in the block
+        if exc_type is None:
+            self.apply()
+        return False
+
+    def _check(self, column_name, exists=True):
+        if isinstance(column_name, sa.sql.schema.Column):
+            column_name = column_name.name
+        if exists and column_name not in self._columns:
+            raise Exception(f"{column_name} does not exists in {self.table_name}!")
+        elif not exists and column_name in self._columns:
+            raise Exception(f"{column_name} already exists in {self.table_name}!")
+        return column_name
+
+    def add(self, column_name, type_=sa.TEXT):
+        """
+        add a new column
+
+        parameters:
+            column_name: str or Sqlalchemy Column object
+            type_: Sqlalchemy Type, default TEXT
+
+        returns:
+            self
+        """
+        if isinstance(column_name, sa.sql.schema.Column):
+            col = column_name
+            if isinstance(col.type, sa.sql.sqltypes.NullType):
+                col.type = type_
+        else:
+            col = sa.Column(column_name, type_=type_)
+        self._check(col.name, exists=False)
+        self._columns.append(col.name)
+        self.operations.append(("add", col, None))
+        return self
+
+    def drop(self, column_name):
+        """
+        drop a column
+
+        parameters:
+            column_name: str or Sqlalchemy Column object
+
+        returns:
+            self
+        """
+        column_name = self._check(column_name)
+        self._columns.remove(column_name)
+        self.operations.append(("drop", column_name, None))
+        return self
+
+    def retype(self, column_name, type_):
+        """
+        change a column's type
+
+        parameters:
+            column_name: str or Sqlalchemy Column object
+            type_: Sqlalchemy Type
+
+        returns:
+            self
+        """
+        column_name = self._check(column_name)
+        self.operations.append(("retype", column_name, type_))
+        return self
+
+    def apply(self, online: bool = False, chunksize: int = CHUNKSIZE, progress=False):
+        """
+        apply the collected operations with one table rebuild
+
+        parameters:
+            online: bool, default False, copy the table in chunks, see ``apply_online``
+            chunksize: int, default CHUNKSIZE, rows per transaction in online mode
+            progress: bool|callable, default False, see ``apply_online``
+
+        returns:
+            True if applied, False if there is no operation
+        """
+        if not self.operations:
+            return False
+
+        start = time.perf_counter()
+        if self.verbose:
+            ops = ", ".join(
+                f"{kind} {col.name if kind == 'add' else col}"
+                for kind, col, _ in self.operations
+            )
+            logging.warning(f"altering {self.table_name}: {ops}")
+
+        if online:
+            self.apply_online(chunksize, progress)
+        else:
+            with self.orm._begin() as conn:
+                ctx = alembic.runtime.migration.MigrationContext.configure(conn)
+                op = alembic.operations.Operations(ctx)
+                # the table is rebuilt once when the batch context exits
+                with op.batch_alter_table(self.table_name) as batch_op:
+                    for kind, col, type_ in self.operations:
+                        if kind == "add":
+                            batch_op.add_column(col)
+                        elif kind == "drop":
+                            batch_op.drop_column(col)
+                        elif kind == "retype":
+                            batch_op.alter_column(col, type_=type_)
+
+        self.elapsed = time.perf_counter() - start
+        if self.verbose:
+            logging.warning(f"{self.table_name} altered in {self.elapsed:.2f}s")
+
+        self.operations = []
+        return True
+
+    def apply_online(self, chunksize: int = CHUNKSIZE, progress=False):
+        """
+        rebuild the table in rowid-ranged chunks with short transactions
+
+        A shadow table with the new schema is filled chunk by chunk with
+        ``INSERT ... SELECT CAST(...)``, each chunk in its own transaction, so
+        readers and writers get the database between chunks. Triggers on the
+        table mirror concurrent writes into the shadow table. At the end the
+        tables are swapped in one transaction, indexes and triggers recreated.
+
+        parameters:
+            chunksize: int, default CHUNKSIZE, rows per transaction
+            progress: bool|callable, default False, a tqdm bar if True,
+                or called as ``progress(copied, total)`` after each chunk
+
+        returns:
+            True
+
+        note:
+            * retyped values are converted with sqlite's ``CAST`` as in ``apply``
+            * the file still grows by the table size during the copy, but the
+              journal (WAL) only by a chunk
+            * indexes are built in the swap transaction
+
+        warning:
+            WITHOUT ROWID tables are not supported, use ``apply()``.
+        """
+        orm, name = self.orm, self.table_name
+        q = orm._quote
+        shadow = f"_ozcore_rewrite_{name}"
+        new, columns, exprs = self._shadow_table(shadow)
+        rowid = self._rowid_alias()
+        # the rowid is copied so that triggers can follow the records
+        targets = ", ".join(([] if rowid else ["rowid"]) + [q(col) for col in columns])
+
+        def _values(ref):
+            values = ([] if rowid else [f"{ref}.rowid"]) + [
+                expr.format(src=ref) for expr in exprs
+            ]
+            return ", ".join(values)
+
+        upsert = f"INSERT OR REPLACE INTO {q(shadow)} ({targets})"
+        triggers = {
+            "ai": f"AFTER INSERT ON {q(name)} BEGIN {upsert} VALUES ({_values('new')}); END",
+            "au": (
+                f"AFTER UPDATE ON {q(name)} BEGIN "
+                f"DELETE FROM {q(shadow)} WHERE rowid = old.rowid; "
+                f"{upsert} VALUES ({_values('new')}); END"
+            ),
+            "ad": (
+                f"AFTER DELETE ON {q(name)} BEGIN "
+                f"DELETE FROM {q(shadow)} WHERE rowid = old.rowid; END"
+            ),
+        }
+        trigger_names = [f"_ozcore_rewrite_{name}_{kind}" for kind in triggers]
+
+        with orm._begin() as conn:
+            existing = conn.exec_driver_sql(
+                "SELECT type, name, sql FROM sqlite_master "
+                "WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL",
+                (name,),
+            ).fetchall()
+            total = conn.exec_driver_sql(f"SELECT COUNT(*) FROM {q(name)}").scalar()
+            new.drop(conn, checkfirst=True)
+            new.create(conn)
+            for trigger, body in zip(trigger_names, triggers.values()):
+                conn.exec_driver_sql(f"CREATE TRIGGER {q(trigger)} {body}")
+
+        bar = None
+        if progress is True and core.utils.check_modules("tqdm"):
+            from tqdm.auto import tqdm
+
+            bar = tqdm(total=total, desc=f"rewriting {name}", unit="rows")
+
+        copy = f"{upsert} SELECT {_values(q(name))} FROM {q(name)} WHERE rowid > ? AND rowid <= ?"
+        upper = (
+            f"SELECT MAX(rowid) FROM (SELECT rowid FROM {q(name)} "
+            "WHERE rowid > ? ORDER BY rowid LIMIT ?)"
+        )
+        try:
+            last, copied = -(2**63), 0
+            while True:
+                with orm._begin() as conn:
+                    high = conn.exec_driver_sql(upper, (last, chunksize)).scalar()
+                    if high is None:
+                        break
+                    n = conn.exec_driver_sql(copy, (last, high)).rowcount
+                last, copied = high, copied + n
+                if bar is not None:
+                    bar.update(n)
+                elif callable(progress):
+                    progress(copied, total)
+
+            with orm._begin() as conn:
+                for trigger in trigger_names:
+                    conn.exec_driver_sql(f"DROP TRIGGER {q(trigger)}")
+                conn.exec_driver_sql(f"DROP TABLE {q(name)}")
+                # views referring to the table are resolved again after the rename
+                # the pragma is set on the pooled connection, so it is restored even on errors
+                legacy = conn.exec_driver_sql("PRAGMA legacy_alter_table").scalar()
+                conn.exec_driver_sql("PRAGMA legacy_alter_table = ON")
+                try:
+                    conn.exec_driver_sql(f"ALTER TABLE {q(shadow)} RENAME TO {q(name)}")
+                finally:
+                    conn.exec_driver_sql(f"PRAGMA legacy_alter_table = {int(legacy)}")
+                for kind, obj, sql in existing:
+                    self._recreate(conn, kind, obj, sql)
+        except Exception:
+            with orm._begin() as conn:
+                for trigger in trigger_names:
+                    conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {q(trigger)}")
+                conn.exec_driver_sql(f"DROP TABLE IF EXISTS {q(shadow)}")
+            raise
+        finally:
+            if bar is not None:
+                bar.close()
+
+        return True
+
+    def _shadow_table(self, shadow):
+        """
+        the table with the collected operations applied, under the shadow name
+
+        returns:
+            tuple of (Sqlalchemy Table, copied column names, select expressions of copied columns)
+        """
+        old = self.orm.schema.table(self.table_name)
+        drops = {col for kind, col, _ in self.operations if kind == "drop"}
+        retypes = {
+            col: sa.types.to_instance(type_)
+            for kind, col, type_ in self.operations
+            if kind == "retype"
+        }
+        q = self.orm._quote
+        dialect = self.orm.engine.dialect
+
+        metadata = sa.MetaData()
+        items, columns, exprs = [], [], []
+        for col in old.columns:
+            if col.name in drops:
+                continue
+            new = sa.Column(
+                col.name,
+                retypes.get(col.name, col.type),
+                primary_key=col.primary_key,
+                nullable=col.nullable,
+                server_default=(
+                    sa.DefaultClause(col.server_default.arg) if col.server_default else None
+                ),
+            )
+            if isinstance(new.type, sa.types.NullType):
+                new.type = sa.BLOB()  # NullType has no DDL
+            items.append(new)
+            columns.append(col.name)
+            if col.name in retypes:
+                type_sql = retypes[col.name].compile(dialect=dialect)
+                exprs.append(f"CAST({{src}}.{q(col.name)} AS {type_sql})")
+            else:
+                exprs.append(f"{{src}}.{q(col.name)}")
+        items += [col._copy() for kind, col, _ in self.operations if kind == "add"]
+
+        for cons in old.constraints:
+            names = [col.name for col in cons.columns]
+            if any(col in drops for col in names):
+                continue
+            if isinstance(cons, sa.UniqueConstraint):
+                items.append(sa.UniqueConstraint(*names))
+            elif isinstance(cons, sa.CheckConstraint):
+                text = str(cons.sqltext)
+                if not any(re.search(rf"\b{re.escape(col)}\b", text) for col in drops):
+                    items.append(sa.CheckConstraint(text))
+            elif isinstance(cons, sa.ForeignKeyConstraint):
+                # a stub of the referred table, enough to render REFERENCES
+                refs = [fk.column for fk in cons.elements]
+                referred = refs[0].table.name
+                if referred not in metadata.tables:
+                    sa.Table(referred, metadata, *[sa.Column(ref.name) for ref in refs])
+                items.append(
+                    sa.ForeignKeyConstraint(
+                        names,
+                        [f"{referred}.{ref.name}" for ref in refs],
+                        ondelete=cons.ondelete,
+                        onupdate=cons.onupdate,
+                    )
+                )
+
+        return sa.Table(shadow, metadata, *items), columns, exprs
+
+    def _rowid_alias(self):
+        """
+        True if the table has an INTEGER PRIMARY KEY, an alias of rowid
+        """
+        with self.orm.engine.connect() as conn:
+            info = conn.exec_driver_sql(
+                f"PRAGMA table_info({self.orm._quote(self.table_name)})"
+            ).fetchall()
+            without_rowid = conn.exec_driver_sql(
+                "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?",
+                (self.table_name,),
+            ).scalar()
+        if re.search(r"WITHOUT\s+ROWID\s*$", without_rowid or "", re.IGNORECASE):
+            raise Exception(f"{self.table_name} is a WITHOUT ROWID table, use apply()")
+        pks = [row for row in info if row[5]]
+        return len(pks) == 1 and pks[0][2].upper() == "INTEGER"
+
+    def _recreate(self, conn, kind, name, sql):
+        """
+        create an index or trigger of the old table again, skipped if it refers to a dropped column
+        """
+        savepoint = conn.begin_nested()
+        try:
+            conn.exec_driver_sql(sql)
+            savepoint.commit()
+        except sa.exc.OperationalError as e:
+            savepoint.rollback()
+            logging.warning(f"{kind} {name} is not recreated: {e.orig}")
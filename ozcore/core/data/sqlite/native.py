@@ -0,0 +1,174 @@
+""" native sqlite3 reader, bypasses Sqlalchemy result rows """
+
+import numpy as np
+import pandas as pd
+
+# rows fetched per cursor round trip
+ARRAYSIZE = 50_000
+
+
+def compile_select(stmt, dialect, params: dict = None) -> tuple:
+    """
+    a Sqlalchemy statement as DBAPI SQL and positional parameters
+
+    parameters:
+        stmt: Sqlalchemy Select object
+        dialect: Sqlalchemy dialect of the engine
+        params: dict, default None, values of named parameters in the statement
+
+    returns:
+        tuple of (sql: str, parameters: tuple)
+    """
+    compiled = stmt.compile(dialect=dialect)
+    values = {**compiled.params, **(params or {})}
+    return str(compiled), tuple(values[name] for name in compiled.positiontup or [])
+
+
+def object_array(rows: list, width: int) -> np.ndarray:
+    """
+    a 2D object array from row tuples
+
+    parameters:
+        rows: list of row tuples
+        width: int, number of columns
+
+    returns:
+        numpy object array of shape (len(rows), width)
+    """
+    arr = np.empty((len(rows), width), dtype=object)
+    if rows:
+        arr[:] = rows
+    return arr
+
+
+def column_array(values: np.ndarray, dtype: str = None, nullable: bool = False):
+    """
+    an array of a column's values with the declared dtype
+
+    parameters:
+        values: numpy object array of python objects from sqlite, may be a view
+        dtype: str, default None, see ``schema.sa_dtype``, inferred if None
+        nullable: bool, default False, integer and boolean columns as Int64 and boolean
+            even without NULLs, otherwise as int64 and bool as the default engine
+
+    returns:
+        numpy or pandas extension array not sharing memory with values,
+        inferred if values do not fit the dtype
+    """
+    if dtype == "object":
+        return values.copy()
+
+    # "integer" with skipna=False means there is no None, the mask is empty
+    kind = pd.api.types.infer_dtype(values, skipna=False)
+    if dtype == "Int64" and kind == "integer":
+        ints = values.astype(np.int64)
+        return pd.arrays.IntegerArray(ints, np.zeros(len(ints), dtype=bool)) if nullable else ints
+    elif dtype == "boolean" and kind in ("integer", "boolean"):
+        bools = values.astype(bool)
+        return pd.arrays.BooleanArray(bools, np.zeros(len(bools), dtype=bool)) if nullable else bools
+    elif dtype == "float64" and kind in ("floating", "integer", "mixed-integer-float"):
+        return values.astype(np.float64)
+
+    kind = pd.api.types.infer_dtype(values, skipna=True)
+    if dtype == "float64" and kind in ("floating", "integer", "mixed-integer-float", "empty"):
+        # None is converted to nan
+        return values.astype(np.float64)
+    elif dtype == "Int64" and kind in ("integer", "empty"):
+        return pd.array(values, dtype="Int64")
+    elif dtype == "boolean" and kind in ("integer", "boolean", "empty"):
+        return pd.array(values, dtype="boolean")
+
+    # not declared or sqlite dynamic typing: values do not match the declared type
+    return pd.Series(values.copy(), dtype=object).infer_objects().array
+
+
+def frame(names: list, arr: np.ndarray, dtypes: dict = None, nullable: bool = False) -> pd.DataFrame:
+    """
+    a DataFrame from a 2D object array
+
+    parameters:
+        names: list of column names
+        arr: numpy object array, see ``object_array``
+        dtypes: dict, default None, declared dtypes of the columns
+        nullable: bool, default False, see ``column_array``
+
+    returns:
+        DataFrame
+    """
+    dtypes = dtypes or {}
+    # column views are converted into new arrays, so neither a transposed copy of arr
+    # nor a copy into the DataFrame's blocks is needed
+    data = {
+        name: column_array(arr[:, i], dtypes.get(name), nullable)
+        for i, name in enumerate(names)
+    }
+    return pd.DataFrame(data, columns=names, copy=False)
+
+
+def _iter_batches(engine, sql, parameters, arraysize):
+    """yields the column names first, then row batches of arraysize"""
+    conn = engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.arraysize = arraysize
+        cursor.execute(sql, parameters)
+        yield [d[0] for d in cursor.description]
+        while True:
+            rows = cursor.fetchmany()
+            if not rows:
+                break
+            yield rows
+        cursor.close()
+    finally:
+        conn.close()  # back to the pool
+
+
+def read_native(
+    engine,
+    stmt,
+    params: dict = None,
+    dtypes: dict = None,
+    index_column: str = None,
+    chunksize: int = None,
+    arraysize: int = ARRAYSIZE,
+):
+    """
+    run a select on a raw sqlite3 cursor and build column arrays from the tuples
+
+    parameters:
+        engine: sqlalchemy engine
+        stmt: Sqlalchemy Select object
+        params: dict, default None, values of named parameters in the statement
+        dtypes: dict, default None, declared dtypes of the columns
+        index_column: str, default None, column to set as index
+        chunksize: int, default None, yield DataFrames of chunksize rows
+        arraysize: int, default ARRAYSIZE, rows per cursor fetch
+
+    returns:
+        * a DataFrame
+        * an iterator of DataFrames if chunksize is given, integer and boolean columns
+          as Int64 and boolean in every chunk as in ``iter_pages``
+    """
+    sql, parameters = compile_select(stmt, engine.dialect, params)
+
+    def _frame(names, arr, nullable=False):
+        df = frame(names, arr, dtypes, nullable)
+        return df.set_index(index_column) if index_column is not None else df
+
+    if chunksize is not None:
+
+        def _chunks():
+            batches = _iter_batches(engine, sql, parameters, chunksize)
+            names = next(batches)
+            for rows in batches:
+                # the declared dtype in every chunk, whether a chunk has NULLs or not
+                yield _frame(names, object_array(rows, len(names)), nullable=True)
+
+        return _chunks()
+
+    batches = _iter_batches(engine, sql, parameters, arraysize)
+    names = next(batches)
+    # row tuples of a batch are released once copied into an object array
+    arrays = [object_array(rows, len(names)) for rows in batches]
+    arr = np.concatenate(arrays) if arrays else object_array([], len(names))
+    return _frame(names, arr)
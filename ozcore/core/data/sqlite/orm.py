@@ -1,11 +1,43 @@
 """ sqlite alter operations  """
 
 import logging
+import sqlite3
 
 import alembic
 import pandas as pd
 import sqlalchemy as sa
 
+from .migration import CHUNKSIZE, Alter
+
+def df_records(df: pd.DataFrame, columns: list = None) -> list:
+    """
+    records of a DataFrame as python objects ready to bind
+
+    parameters:
+        df: DataFrame
+        columns: list, default None, columns to take (all columns if None)
+
+    returns:
+        list of tuples, numpy scalars as python objects and NaN as None
+
+    note:
+        datetime columns are given as text in Sqlalchemy's sqlite storage format
+    """
+    if columns is not None:
+        df = df[columns]
+    dates = df.select_dtypes(include=["datetime", "datetimetz"]).columns
+    if len(dates):
+        df = df.copy()
+        for col in dates:
+            df[col] = df[col].dt.strftime("%Y-%m-%d %H:%M:%S.%f")
+    df = df.astype(object).where(df.notna(), None)
+    return list(df.itertuples(index=False, name=None))
+
+
+def _bind_type(type_):
+    """a type to create a column with, NullType has no DDL"""
+    return sa.BLOB() if isinstance(type_, sa.types.NullType) else type_
+
 
 class ORM:
     """
@@ -52,7 +84,7 @@ class ORM:
         #     logging.error(msg)
         #     raise Exception(msg)
 
-        with self.engine.connect() as conn:
+        with self._begin() as conn:
             ctx = alembic.runtime.migration.MigrationContext.configure(conn)
             op = alembic.operations.Operations(ctx)
             if not isinstance(col, sa.sql.schema.Column):
@@ -90,17 +122,16 @@ class ORM:
             logging.error(f"{col} does not exists in {table_name}!")
             return False
 
-        with self.engine.connect() as conn:
-            ctx = alembic.runtime.migration.MigrationContext.configure(conn)
-            op = alembic.operations.Operations(ctx)
-            with op.batch_alter_table(table_name) as batch_op:
-                # sqlite has different column operation
-                # alembic solves this issue with batch_alter_table
-                batch_op.drop_column(col)  # drop column
+        with self.alter(table_name, verbose=False) as batch:
+            # sqlite has different column operation
+            # alembic solves this issue with batch_alter_table
+            batch.drop(col)  # drop column
 
         return True
 
-    def sa_change_column_type(self, table_name, column_name, type_):
+    def sa_change_column_type(
+        self, table_name, column_name, type_, online=False, chunksize=CHUNKSIZE, progress=False
+    ):
         """
         alter table: change a column's type
 
@@ -108,6 +139,9 @@ class ORM:
             table_name: str
             column_name: str, as column name or a sqlalchemy Column object
             type_: Sqlalchemy Type
+            online: bool, default False, copy the table in chunks with short transactions, see ``Alter.apply_online``
+            chunksize: int, default CHUNKSIZE, rows per transaction in online mode
+            progress: bool|callable, default False, a progress bar in online mode
 
         returns:
             * True if type is changed successfully
@@ -135,13 +169,34 @@ class ORM:
         #     logging.error(f"{type(type_)} is not an Sqlalchemy type!")
         #     return False
 
-        with self.engine.connect() as conn:
-            ctx = alembic.runtime.migration.MigrationContext.configure(conn)
-            op = alembic.operations.Operations(ctx)
-            with op.batch_alter_table(table_name) as batch_op:
-                # sqlite has no drop column operation
-                # alembic solves this issue with batch_alter_table
-                batch_op.alter_column(col, type_=type_)  # change column type
+        # sqlite has no alter column operation
+        # alembic solves this issue with batch_alter_table, or a chunked copy if online
+        batch = self.alter(table_name, verbose=False)
+        batch.retype(col, type_=type_)  # change column type
+        batch.apply(online=online, chunksize=chunksize, progress=progress)
+
+        return True
+
+    def alter(self, table_name, verbose=True):
+        """
+        batch column operations on a table with a single table rebuild
+
+        parameters:
+            table_name: str or Sqlalchemy Table object
+            verbose: bool, default True, logging progress and timing
+
+        returns:
+            Alter object, applies the operations when its context exits
+
+        usage::
+
+            with sql.alter("table_name") as t:
+                t.add("new_column", sa.INTEGER)
+                t.drop("old_column")
+                t.retype("col2", sa.TEXT)
+
+        """
+        return Alter(self, table_name, verbose=verbose)
 
     def sa_table(self, table_name: str):
         """
@@ -159,9 +214,7 @@ class ORM:
         if not self.table_exists(table_name):
             logging.error(f"{table_name} does not exists in this database!")
             return False
-        metadata = sa.MetaData()
-        metadata.reflect(self.engine)
-        return sa.Table(table_name, metadata)
+        return self.schema.table(table_name)
 
     def sa_column(self, table_name: str, column_name: str):
         """
@@ -201,14 +254,21 @@ class ORM:
         tbl = self.sa_table(table_name)
         col = self.sa_column(tbl, column_name)
 
-        with self.engine.connect() as conn:
+        with self._begin() as conn:
             expr = tbl.update().where(tbl.c[compare_column] == compare_val).values(
                 {column_name: val}
             )
             conn.execute(expr)
-            conn.commit()
 
-    def sa_update_a_column(self, table_name, column_name, compare_column, source_df):
+    def sa_update_a_column(
+        self,
+        table_name,
+        column_name,
+        compare_column,
+        source_df,
+        bulk=False,
+        auto_index=False,
+    ):
         """
         update a column's records based on a given df_slice
 
@@ -216,8 +276,18 @@ class ORM:
             table_name: str or Sqlalchemy Table object
             column_name: str or Sqlalchemy Column object
             compare_column: str, the common unique columnn to compare record
-            compare_val: mixed, a value to compare in compare_column
             source_df: source records as a DataFrame or Series, to update the Table
+            bulk: bool, default False, update all records in a single transaction
+            auto_index: bool, default False, index compare_column during the update if it has no index
+
+        note:
+            In bulk mode, source records are loaded into a temporary table and
+            applied with one ``UPDATE ... FROM`` statement. If compare_column has
+            duplicates in source_df, the last record wins as in row by row mode.
+            ``UPDATE ... FROM`` needs SQLite 3.33, records are updated row by row on older versions.
+
+            With auto_index, SQLite can look up each source record in the table instead
+            of scanning it, which pays off when source_df is much smaller than the table.
 
         warning:
             index of source_df is ignored
@@ -243,14 +313,75 @@ class ORM:
             logging.error("Unique column name should be str")
             raise TypeError("Unique column name should a String")
 
-        for row in df.iterrows():
-            row = row[1]
-            self.sa_update_a_record(
-                table_name=tbl.name,
-                column_name=col.name,
-                compare_column=compare_column,
-                compare_val=row[compare_column],
-                val=row[column_name],
+        index = None
+        if auto_index and not self.index_exists(tbl.name, compare_column):
+            index = self.create_index(
+                tbl.name, compare_column, name=f"ix_tmp_{tbl.name}_{compare_column}"
             )
 
+        if bulk and sqlite3.sqlite_version_info < (3, 33):
+            logging.warning(f"SQLite {sqlite3.sqlite_version} has no UPDATE ... FROM, updating row by row")
+            bulk = False
+
+        try:
+            if bulk:
+                return self._sa_bulk_update(tbl, col, compare_column, df)
+
+            for row in df.iterrows():
+                row = row[1]
+                self.sa_update_a_record(
+                    table_name=tbl.name,
+                    column_name=col.name,
+                    compare_column=compare_column,
+                    compare_val=row[compare_column],
+                    val=row[column_name],
+                )
+        finally:
+            if index is not None:
+                self.drop_index(index)
+
+        return True
+
+    def _sa_bulk_update(self, tbl, col, compare_column, df):
+        """
+        set-based update of a column via a temporary table
+
+        parameters:
+            tbl: Sqlalchemy Table object to be updated
+            col: Sqlalchemy Column object to be updated
+            compare_column: str, the common unique columnn to compare record
+            df: DataFrame having compare_column and col.name
+
+        returns:
+            True
+        """
+        df = df.drop_duplicates(subset=compare_column, keep="last")
+
+        src = sa.Table(
+            "_ozcore_bulk_update",
+            sa.MetaData(),
+            sa.Column("key", _bind_type(tbl.c[compare_column].type)),
+            sa.Column("val", _bind_type(col.type)),
+            prefixes=["TEMPORARY"],
+        )
+        records = [
+            {"key": key, "val": val}
+            for key, val in df_records(df, [compare_column, col.name])
+        ]
+
+        with self._begin() as conn:
+            src.drop(conn, checkfirst=True)
+            src.create(conn)
+            try:
+                # insert untyped, records are already bindable
+                untyped = sa.table(src.name, sa.column("key"), sa.column("val"))
+                conn.execute(sa.insert(untyped), records)
+                conn.execute(
+                    tbl.update()
+                    .where(tbl.c[compare_column] == src.c.key)
+                    .values({col.name: src.c.val})
+                )
+            finally:
+                src.drop(conn, checkfirst=True)
+
         return True
@@ -0,0 +1,118 @@
+""" concurrent multi-table reads """
+
+import enum
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import sqlalchemy as sa
+
+# a DataFrame takes about this many times the on-disk size of its table
+MEMORY_FACTOR = 3
+
+
+class Parallel:
+    """
+    Reads several tables at once on a thread pool
+
+    Each worker reads on its own pooled connection. sqlite3 releases the GIL
+    while stepping through rows, so readers overlap. With a WAL journal
+    (e.g. ``profile="fast-read"``) writers do not block them either.
+
+    usage::
+
+        dfs = sql.read_many(sql.tables_list, max_workers=4)
+        dfs["table_name"]
+
+        # tables over the budget are returned as iterators of chunks
+        dfs = sql.read_many(memory_budget=2 * 2**30)
+
+    """
+
+    def table_bytes(self, table_name):
+        """
+        on-disk size of a table
+
+        parameters:
+            table_name: str|enum
+
+        returns:
+            int, bytes from the ``dbstat`` table, estimated from the row count if not available
+        """
+        if isinstance(table_name, enum.Enum):
+            table_name = table_name.name
+
+        with self.engine.connect() as conn:
+            try:
+                size = conn.exec_driver_sql(
+                    "SELECT SUM(pgsize) FROM dbstat WHERE name = ?", (table_name,)
+                ).scalar()
+                return int(size or 0)
+            except sa.exc.OperationalError:
+                pass
+
+        # sqlite built without SQLITE_ENABLE_DBSTAT_VTAB
+        return self._count(table_name) * len(self.columns(table_name)) * 16
+
+    def read_many(self, tables=None, max_workers=4, memory_budget=None, **kwargs):
+        """
+        read tables concurrently into a dict of DataFrames
+
+        parameters:
+            tables: list, default None, table names (all tables if None)
+            max_workers: int, default 4, number of threads
+            memory_budget: int, default None, bytes the DataFrames may take in total
+            kwargs: ``read`` arguments e.g. limit, columns, engine
+
+        returns:
+            dict of table name and DataFrame,
+            tables not fitting in memory_budget have an iterator of DataFrames instead
+
+        note:
+            * table sizes are estimated as MEMORY_FACTOR times their on-disk size
+            * smaller tables are read first within the budget, the rest are chunked
+              so that a chunk takes at most memory_budget / max_workers
+            * each worker reads on its own pooled connection, a warning is logged if the
+              journal is not WAL, since a writer would then block all of them
+        """
+        if not self.in_memory and self._journal_mode() != "wal":
+            logging.warning(
+                "journal_mode is not WAL, writers block the readers, "
+                "use a WAL profile e.g. profile='fast-read'"
+            )
+
+        if tables is None:
+            tables = self.schema.table_names
+        tables = [tbl.name if isinstance(tbl, enum.Enum) else tbl for tbl in tables]
+
+        chunked = {}
+        if memory_budget is not None:
+            sizes = {tbl: self.table_bytes(tbl) * MEMORY_FACTOR for tbl in tables}
+            total = 0
+            for tbl in sorted(tables, key=sizes.get):
+                if total + sizes[tbl] <= memory_budget:
+                    total += sizes[tbl]
+                    continue
+                rows = self._count(tbl) or 1
+                row_bytes = max(sizes[tbl] // rows, 1)
+                chunked[tbl] = max(memory_budget // max_workers // row_bytes, 1)
+                logging.warning(f"{tbl} is over the memory budget, read in chunks of {chunked[tbl]} rows")
+
+        results = {tbl: self.read(tbl, chunksize=chunked[tbl], **kwargs) for tbl in chunked}
+
+        eager = [tbl for tbl in tables if tbl not in chunked]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {tbl: executor.submit(self.read, tbl, **kwargs) for tbl in eager}
+            for tbl, future in futures.items():
+                results[tbl] = future.result()
+
+        return {tbl: results[tbl] for tbl in tables}
+
+    def _journal_mode(self):
+        with self.engine.connect() as conn:
+            return conn.exec_driver_sql("PRAGMA journal_mode").scalar().lower()
+
+    def _count(self, table_name):
+        with self.engine.connect() as conn:
+            return conn.execute(
+                sa.select(sa.func.count()).select_from(sa.table(table_name))
+            ).scalar()
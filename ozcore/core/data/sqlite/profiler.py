@@ -0,0 +1,158 @@
+""" query and transaction instrumentation for sqlite engines """
+
+import sqlite3
+import threading
+import time
+import traceback
+from collections import deque
+from pathlib import Path
+
+import pandas as pd
+import sqlalchemy as sa
+
+# frames in these folders are skipped to find the caller of a statement
+_SKIP = tuple(str(Path(module.__file__).parent) for module in (sa, pd, sqlite3)) + (
+    str(Path(__file__).parent),
+)
+
+
+def _caller() -> str:
+    """first frame outside sqlalchemy, pandas, sqlite3 and this package"""
+    for frame in reversed(traceback.extract_stack()[:-2]):
+        if not frame.filename.startswith(_SKIP):
+            return f"{Path(frame.filename).name}:{frame.lineno} {frame.name}"
+    return ""
+
+
+class QueryProfiler:
+    """
+    Records statements and transactions of an engine with Sqlalchemy events
+
+    parameters:
+        engine: sqlalchemy engine
+        maxlen: int, default 100_000, the most recent statements kept
+        caller: bool, default True, record the caller of each statement (walks the stack)
+
+    usage::
+
+        sql.enable_profiler()
+        ...  # run the job
+        sql.stats(top=10)
+        # statements by total time with count, mean, max, rows and caller
+
+    """
+
+    def __init__(self, engine, maxlen: int = 100_000, caller: bool = True):
+        self.engine = engine
+        self.caller = caller
+        self.records = deque(maxlen=maxlen)
+        self.transactions = {"begin": 0, "commit": 0, "rollback": 0}
+        self._lock = threading.Lock()
+        self._listeners = [
+            ("before_cursor_execute", self._before),
+            ("after_cursor_execute", self._after),
+            ("begin", self._begin),
+            ("commit", self._commit),
+            ("rollback", self._rollback),
+        ]
+        self.active = False
+
+    def start(self):
+        """
+        attach the event listeners
+
+        returns:
+            self
+        """
+        if not self.active:
+            for name, func in self._listeners:
+                sa.event.listen(self.engine, name, func)
+            self.active = True
+        return self
+
+    def stop(self):
+        """
+        detach the event listeners, records are kept
+
+        returns:
+            self
+        """
+        if self.active:
+            for name, func in self._listeners:
+                sa.event.remove(self.engine, name, func)
+            self.active = False
+        return self
+
+    def reset(self):
+        """
+        drop the records
+        """
+        with self._lock:
+            self.records.clear()
+            self.transactions = dict.fromkeys(self.transactions, 0)
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("ozcore_query_start", []).append(time.perf_counter())
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info["ozcore_query_start"].pop()
+        rows = cursor.rowcount if cursor.rowcount is not None and cursor.rowcount >= 0 else None
+        record = {
+            "statement": statement,
+            "duration": duration,
+            "rows": rows,
+            "executemany": executemany,
+            "caller": _caller() if self.caller else "",
+        }
+        with self._lock:
+            self.records.append(record)
+
+    def _count(self, name):
+        with self._lock:
+            self.transactions[name] += 1
+
+    def _begin(self, conn):
+        self._count("begin")
+
+    def _commit(self, conn):
+        self._count("commit")
+
+    def _rollback(self, conn):
+        self._count("rollback")
+
+    def stats(self, top: int = 20) -> pd.DataFrame:
+        """
+        statements by total time
+
+        parameters:
+            top: int, default 20, number of statements, all if None
+
+        returns:
+            DataFrame with statement index and count, total, mean, max, rows and caller columns
+
+        note:
+            rows is the sum of affected rows reported by the cursor, SELECTs report none
+        """
+        with self._lock:
+            df = pd.DataFrame(
+                list(self.records),
+                columns=["statement", "duration", "rows", "executemany", "caller"],
+            )
+
+        if df.empty:
+            return pd.DataFrame(columns=["count", "total", "mean", "max", "rows", "caller"])
+
+        grouped = df.groupby("statement")
+        stats = pd.DataFrame(
+            {
+                "count": grouped.size(),
+                "total": grouped.duration.sum(),
+                "mean": grouped.duration.mean(),
+                "max": grouped.duration.max(),
+                "rows": grouped.rows.sum(min_count=1),
+                # the most frequent caller of a statement
+                "caller": grouped.caller.agg(lambda s: s.mode().iloc[0]),
+            }
+        ).sort_values("total", ascending=False)
+
+        return stats if top is None else stats.head(top)
@@ -0,0 +1,103 @@
+""" pareto and ranking of sqlite tables with window functions """
+
+import enum
+
+import pandas as pd
+import sqlalchemy as sa
+
+
+class Ranking:
+    """
+    In-database equivalent of ``core.df.paretoranking``
+
+    For each column, ``<col>_pareto`` is the cumulative share of the column in
+    descending order and ``<col>_ranking`` is the share of the column's maximum,
+    both in percent. They are computed with window functions, so only the
+    result leaves sqlite, or nothing at all when written into a table.
+
+    usage::
+
+        sql.pareto("sales", ["revenue", "units"])
+        sql.pareto("sales", "revenue", by="region")  # within each region
+        sql.pareto("sales", "revenue", into="sales_pareto")  # a new table
+
+    """
+
+    def pareto_query(self, table_name, cols, by=None):
+        """
+        the pareto and ranking select of a table
+
+        parameters:
+            table_name: str|enum
+            cols: str|list, numeric columns
+            by: str|list, default None, columns to compute within their groups
+
+        returns:
+            str, SQL selecting the table's columns and the pareto and ranking columns
+        """
+        if isinstance(table_name, enum.Enum):
+            table_name = table_name.name
+        cols = [cols] if isinstance(cols, str) else list(cols)
+        by = [by] if isinstance(by, str) else list(by or [])
+
+        if not self.table_exists(table_name):
+            raise Exception("table name not found in the database!")
+        missing = [col for col in cols + by if not self.column_exists(table_name, col)]
+        if missing:
+            raise Exception(f"{missing} not found in {table_name}!")
+
+        q = self._quote
+        partition = f"PARTITION BY {', '.join(q(col) for col in by)}" if by else ""
+
+        windows = []
+        for col in cols:
+            qc = q(col)
+            ordered = " ".join(
+                filter(None, [partition, f"ORDER BY {qc} DESC ROWS UNBOUNDED PRECEDING"])
+            )
+            cumulative = f"SUM({qc}) OVER ({ordered})"
+            windows.append(
+                f"CASE WHEN {qc} IS NULL THEN NULL "
+                f"ELSE 100.0 * {cumulative} / SUM({qc}) OVER ({partition}) END "
+                f"AS {q(col + '_pareto')}"
+            )
+            windows.append(
+                f"100.0 * {qc} / MAX({qc}) OVER ({partition}) AS {q(col + '_ranking')}"
+            )
+
+        order = ", ".join([q(col) for col in by] + [f"{q(cols[0])} DESC"])
+        return f"SELECT *, {', '.join(windows)} FROM {q(table_name)} ORDER BY {order}"
+
+    def pareto(self, table_name, cols, by=None, into=None, replace=False):
+        """
+        pareto and ranking columns of a table
+
+        parameters:
+            table_name: str|enum
+            cols: str|list, numeric columns
+            by: str|list, default None, columns to compute within their groups
+            into: str, default None, write the result into this new table instead of returning it
+            replace: bool, default False, drop the into table first if exists, in the same transaction
+
+        returns:
+            * a DataFrame of the table with ``<col>_pareto`` and ``<col>_ranking`` columns,
+              ordered by the first column descending
+            * int, number of records written if into is given
+
+        note:
+            as in ``core.df.paretoranking``, ties are accumulated one by one
+        """
+        query = self.pareto_query(table_name, cols, by)
+        if into is None:
+            return pd.read_sql(sa.text(query), con=self.engine)
+
+        if isinstance(table_name, enum.Enum):
+            table_name = table_name.name
+        if into == table_name:
+            raise Exception("into should be different from the table name!")
+        if self.table_exists(into) and not replace:
+            raise Exception(f"{into} already exists!")
+        with self._begin() as conn:
+            conn.exec_driver_sql(f"DROP TABLE IF EXISTS {self._quote(into)}")
+            conn.exec_driver_sql(f"CREATE TABLE {self._quote(into)} AS {query}")
+            return conn.exec_driver_sql(f"SELECT COUNT(*) FROM {self._quote(into)}").scalar()
@@ -0,0 +1,158 @@
+""" table to table merges and comparisons run inside sqlite """
+
+import enum
+
+import pandas as pd
+import sqlalchemy as sa
+
+
+def _name(table_name):
+    return table_name.name if isinstance(table_name, enum.Enum) else table_name
+
+
+class Reconcile:
+    """
+    SQL equivalents of ``core.df`` merge helpers for tables larger than memory
+
+    ============================  ==================================  =========================
+    core.df                       Sqlite                              SQL
+    ============================  ==================================  =========================
+    ``update_a_df_column``        ``update_column_from``              ``UPDATE ... FROM``
+    ``add_a_col_from_a_df``       ``add_column_from``                 ``ALTER`` + ``UPDATE``
+    ``compare_two_df``            ``compare``                         ``EXCEPT``
+    ============================  ==================================  =========================
+
+    Records never leave sqlite, except the differences returned by ``compare``.
+
+    usage::
+
+        sql.update_column_from("customers", "crm_export", "id", "email")
+        sql.add_column_from("customers", "scores", "id", "score")
+        sql.compare("customers", "crm_export", "id", side="left")
+
+    hint:
+        Index the key of the source table (see ``create_index``) for large tables.
+    """
+
+    def _check_columns(self, table_name, columns):
+        if not self.table_exists(table_name):
+            raise Exception(f"{table_name} not found in the database!")
+        missing = [col for col in columns if not self.column_exists(table_name, col)]
+        if missing:
+            raise Exception(f"{missing} not found in {table_name}!")
+
+    def update_column_from(self, table_name, source_table, key, column_name):
+        """
+        update a column with the values of a source table on a common unique key
+
+        parameters:
+            table_name: str|enum, table to be updated
+            source_table: str|enum, table having key and column_name
+            key: str, the common unique column to match records
+            column_name: str, column to be updated
+
+        returns:
+            int, number of updated records
+
+        note:
+            as ``core.df.update_a_df_column``, NULLs in the source do not overwrite values
+        """
+        table_name, source_table = _name(table_name), _name(source_table)
+        self._check_columns(table_name, [key, column_name])
+        self._check_columns(source_table, [key, column_name])
+
+        tbl = self.sa_table(table_name)
+        src = self.sa_table(source_table).alias("src")
+        stmt = (
+            tbl.update()
+            .where(tbl.c[key] == src.c[key], src.c[column_name].isnot(None))
+            .values({column_name: src.c[column_name]})
+        )
+        with self._begin() as conn:
+            return conn.execute(stmt).rowcount
+
+    def add_column_from(self, table_name, source_table, key, column_name):
+        """
+        add a column from a source table on a common unique key
+
+        parameters:
+            table_name: str|enum, table to add the column into
+            source_table: str|enum, table having key and column_name
+            key: str, the common unique column to match records
+            column_name: str, column to be added with its declared type
+
+        returns:
+            int, number of records filled, the rest are NULL
+
+        note:
+            ``ALTER TABLE ... ADD COLUMN`` and the ``UPDATE`` run in one transaction
+        """
+        table_name, source_table = _name(table_name), _name(source_table)
+        self._check_columns(table_name, [key])
+        self._check_columns(source_table, [key, column_name])
+        if self.column_exists(table_name, column_name):
+            raise Exception(f"{column_name} already exists in {table_name}!")
+
+        type_ = self.sa_table(source_table).c[column_name].type
+        ddl = f"ALTER TABLE {self._quote(table_name)} ADD COLUMN {self._quote(column_name)}"
+        if not isinstance(type_, sa.types.NullType):
+            ddl += f" {type_.compile(dialect=self.engine.dialect)}"
+
+        tbl = sa.table(table_name, sa.column(key), sa.column(column_name))
+        src = self.sa_table(source_table).alias("src")
+        stmt = (
+            tbl.update()
+            .where(tbl.c[key] == src.c[key])
+            .values({column_name: src.c[column_name]})
+        )
+        with self._begin() as conn:
+            conn.exec_driver_sql(ddl)
+            return conn.execute(stmt).rowcount
+
+    def compare(self, table_a, table_b, key=None, side="both"):
+        """
+        records of two tables which do not match
+
+        parameters:
+            table_a: str|enum
+            table_b: str|enum
+            key: str|list, default None, columns to compare, all common columns if None
+            side: str, default "both", options: "left" (only in table_a), "right" (only in table_b)
+
+        returns:
+            * a DataFrame of the records whose key is not in the other table
+            * only the common columns if key is None
+            * empty if all match
+
+        note:
+            as ``core.df.compare_two_df``, other columns of records with a matching key are not compared
+        """
+        if side not in ("both", "left", "right"):
+            raise Exception('side should be one of "both", "left", "right"')
+        table_a, table_b = _name(table_a), _name(table_b)
+        key = [key] if isinstance(key, str) else key
+        self._check_columns(table_a, key or [])
+        self._check_columns(table_b, key or [])
+
+        common = None
+        if key is None:
+            columns_b = [col.name for col in self.columns(table_b)]
+            common = [col.name for col in self.columns(table_a) if col.name in columns_b]
+
+        def _only_in(this, other):
+            q_this, q_other = self._quote(this), self._quote(other)
+            if key is None:
+                cols = ", ".join(self._quote(col) for col in common)
+                return f"SELECT {cols} FROM {q_this} EXCEPT SELECT {cols} FROM {q_other}"
+            cols = ", ".join(self._quote(col) for col in key)
+            return (
+                f"SELECT * FROM {q_this} WHERE ({cols}) IN "
+                f"(SELECT {cols} FROM {q_this} EXCEPT SELECT {cols} FROM {q_other})"
+            )
+
+        dfs = []
+        if side in ("both", "left"):
+            dfs.append(pd.read_sql(sa.text(_only_in(table_a, table_b)), con=self.engine))
+        if side in ("both", "right"):
+            dfs.append(pd.read_sql(sa.text(_only_in(table_b, table_a)), con=self.engine))
+        return pd.concat(dfs, ignore_index=True) if len(dfs) > 1 else dfs[0]
@@ -0,0 +1,213 @@
+""" schema reflection cache for sqlite engines """
+
+import enum
+import logging
+import threading
+import weakref
+
+import sqlalchemy as sa
+
+# one cache per engine, released together with the engine
+_CACHES = weakref.WeakKeyDictionary()
+_CACHES_LOCK = threading.Lock()
+
+
+class SchemaCache:
+    """
+    Reflected schema of an engine, revalidated with ``PRAGMA schema_version``
+
+    SQLite increments ``schema_version`` on every schema change, from any connection
+    or process. The cache compares this single integer before answering and
+    drops everything reflected when it has changed.
+
+    parameters:
+        engine: sqlalchemy engine
+
+    usage::
+
+        from ozcore.core.data.sqlite.schema import schema_cache
+
+        cache = schema_cache(engine)
+
+        cache.table_names
+        cache.table("table_name")
+        cache.columns("table_name")
+
+    """
+
+    def __init__(self, engine: sa.engine.Engine):
+        self.engine = engine
+        self.version = None
+        self.metadata = sa.MetaData()
+        self._table_names = None
+        self._tables_enum = None
+        self._columns_enum = {}
+        self._lock = threading.RLock()
+
+    def schema_version(self) -> int:
+        """
+        current schema version of the database
+
+        returns:
+            int, ``PRAGMA schema_version``
+        """
+        with self.engine.connect() as conn:
+            return conn.exec_driver_sql("PRAGMA schema_version").scalar()
+
+    def invalidate(self):
+        """
+        drops every reflected object, next call reflects again
+        """
+        with self._lock:
+            self.version = None
+            self.metadata = sa.MetaData()
+            self._table_names = None
+            self._tables_enum = None
+            self._columns_enum = {}
+
+    def revalidate(self):
+        """
+        compares the schema version and invalidates the cache if it has changed
+
+        returns:
+            self
+        """
+        version = self.schema_version()
+        with self._lock:
+            if version != self.version:
+                self.invalidate()
+                self.version = version
+        return self
+
+    @property
+    def table_names(self) -> list:
+        """
+        table names in the database
+
+        returns:
+            list of str
+        """
+        self.revalidate()
+        with self._lock:
+            if self._table_names is None:
+                self._table_names = sa.inspect(self.engine).get_table_names()
+            return self._table_names
+
+    @property
+    def tables(self) -> enum.IntEnum:
+        """
+        tables in the database as an IntEnum
+
+        returns:
+            enum of table names
+        """
+        names = self.table_names
+        with self._lock:
+            if self._tables_enum is None:
+                self._tables_enum = enum.IntEnum("tables", names)
+            return self._tables_enum
+
+    def table(self, table_name: str) -> sa.Table:
+        """
+        reflected Table object, only the given table is reflected
+
+        parameters:
+            table_name: str
+
+        returns:
+            Sqlalchemy Table object bound to the cached MetaData
+        """
+        self.revalidate()
+        with self._lock:
+            if table_name not in self.metadata.tables:
+                sa.Table(table_name, self.metadata, autoload_with=self.engine)
+            return self.metadata.tables[table_name]
+
+    def dtypes(self, table_name: str) -> dict:
+        """
+        pandas dtypes of a table's columns from their declared types
+
+        parameters:
+            table_name: str
+
+        returns:
+            dict of column name and dtype, see ``sa_dtype``
+        """
+        return {col.name: sa_dtype(col.type) for col in self.table(table_name).columns}
+
+    def columns(self, table_name: str) -> enum.Enum:
+        """
+        columns of a table as an Enum
+
+        parameters:
+            table_name: str
+
+        returns:
+            enum columns (.name as str name, .value as sa col object)
+        """
+        tbl = self.table(table_name)
+        with self._lock:
+            if table_name not in self._columns_enum:
+                dic = {col.name: col for col in tbl.columns}
+                self._columns_enum[table_name] = enum.Enum("columns", dic)
+            return self._columns_enum[table_name]
+
+
+def sa_dtype(type_) -> str:
+    """
+    pandas dtype of a declared Sqlalchemy type
+
+    parameters:
+        type_: Sqlalchemy type instance
+
+    returns:
+        str, nullable dtypes for integer and boolean, object for text and dates
+    """
+    if isinstance(type_, sa.Boolean):
+        return "boolean"
+    elif isinstance(type_, sa.Integer):
+        return "Int64"
+    elif isinstance(type_, (sa.Float, sa.Numeric)):
+        return "float64"
+    return "object"
+
+
+def cast_dtypes(df, dtypes):
+    """
+    cast DataFrame columns to given dtypes
+
+    parameters:
+        df: DataFrame
+        dtypes: dict of column name and dtype, columns not in df are skipped
+
+    returns:
+        DataFrame, a column which can not be cast is given as object
+    """
+    df = df.copy()
+    for col in df.columns:
+        dtype = dtypes.get(col)
+        if dtype is None or df[col].dtype == dtype:
+            continue
+        try:
+            df[col] = df[col].astype(dtype)
+        except (TypeError, ValueError):
+            logging.warning(f"{col} can not be cast to {dtype}, kept as object")
+            df[col] = df[col].astype(object)
+    return df
+
+
+def schema_cache(engine: sa.engine.Engine) -> SchemaCache:
+    """
+    the schema cache of an engine, created at first call
+
+    parameters:
+        engine: sqlalchemy engine
+
+    returns:
+        SchemaCache
+    """
+    with _CACHES_LOCK:
+        cache = _CACHES.get(engine)
+        if cache is None:
+            cache = _CACHES[engine] = SchemaCache(engine)
+        return cache
@@ -0,0 +1,160 @@
+""" full-text search over sqlite tables with FTS5 """
+
+import enum
+
+import pandas as pd
+import sqlalchemy as sa
+
+
+def _literal(value: str) -> str:
+    """string literal for raw SQL"""
+    return "'" + value.replace("'", "''") + "'"
+
+
+class Search:
+    """
+    Full-text search index of a table's text columns
+
+    An external content FTS5 table ``<table>_fts`` indexes the given columns,
+    the records themselves are not duplicated. Triggers on the table keep the
+    index in sync with inserts, updates and deletes.
+
+    usage::
+
+        sql.build_search_index("table_name", ["col1", "col3"])
+
+        sql.search("table_name", "smith OR jacobs")
+        # matching records ranked by bm25, best first
+
+    warning:
+        The index refers to rowids. If the table has no INTEGER PRIMARY KEY,
+        VACUUM or a table rebuild (see ``alter``) may renumber them, build the index again afterwards.
+    """
+
+    def _fts_name(self, table_name):
+        return f"{table_name}_fts"
+
+    def search_index_exists(self, table_name):
+        """
+        checks if a table has a search index
+
+        parameters:
+            table_name: str|enum
+
+        returns:
+            boolean
+        """
+        if isinstance(table_name, enum.Enum):
+            table_name = table_name.name
+        return self.table_exists(self._fts_name(table_name))
+
+    def build_search_index(self, table_name, columns, tokenize="unicode61"):
+        """
+        create (or rebuild) the search index of a table
+
+        parameters:
+            table_name: str|enum
+            columns: str|list, text columns to index
+            tokenize: str, default "unicode61", FTS5 tokenizer e.g. "porter unicode61", "trigram"
+
+        returns:
+            str, name of the FTS5 table
+        """
+        if isinstance(table_name, enum.Enum):
+            table_name = table_name.name
+        columns = [columns] if isinstance(columns, str) else list(columns)
+
+        if not self.table_exists(table_name):
+            raise Exception("table name not found in the database!")
+        missing = [col for col in columns if not self.column_exists(table_name, col)]
+        if missing:
+            raise Exception(f"{missing} not found in {table_name}!")
+
+        self.drop_search_index(table_name)
+
+        fts = self._fts_name(table_name)
+        q_tbl, q_fts = self._quote(table_name), self._quote(fts)
+        cols = ", ".join(self._quote(col) for col in columns)
+        new = ", ".join(f"new.{self._quote(col)}" for col in columns)
+        old = ", ".join(f"old.{self._quote(col)}" for col in columns)
+
+        statements = [
+            f"CREATE VIRTUAL TABLE {q_fts} USING fts5({cols}, "
+            f"content={_literal(table_name)}, content_rowid='rowid', tokenize={_literal(tokenize)})",
+            f"INSERT INTO {q_fts}({q_fts}) VALUES ('rebuild')",
+            f"CREATE TRIGGER {self._quote(fts + '_ai')} AFTER INSERT ON {q_tbl} BEGIN "
+            f"INSERT INTO {q_fts}(rowid, {cols}) VALUES (new.rowid, {new}); END",
+            f"CREATE TRIGGER {self._quote(fts + '_ad')} AFTER DELETE ON {q_tbl} BEGIN "
+            f"INSERT INTO {q_fts}({q_fts}, rowid, {cols}) VALUES ('delete', old.rowid, {old}); END",
+            f"CREATE TRIGGER {self._quote(fts + '_au')} AFTER UPDATE ON {q_tbl} BEGIN "
+            f"INSERT INTO {q_fts}({q_fts}, rowid, {cols}) VALUES ('delete', old.rowid, {old}); "
+            f"INSERT INTO {q_fts}(rowid, {cols}) VALUES (new.rowid, {new}); END",
+        ]
+
+        try:
+            with self._begin() as conn:
+                for statement in statements:
+                    conn.exec_driver_sql(statement)
+        except sa.exc.OperationalError as e:
+            if "fts5" in str(e):
+                raise Exception("FTS5 is not available in this sqlite build!") from e
+            raise
+
+        return fts
+
+    def drop_search_index(self, table_name):
+        """
+        drop the search index of a table and its triggers if exist
+
+        parameters:
+            table_name: str|enum
+
+        returns:
+            True
+        """
+        if isinstance(table_name, enum.Enum):
+            table_name = table_name.name
+
+        fts = self._fts_name(table_name)
+        with self._begin() as conn:
+            for suffix in ("_ai", "_ad", "_au"):
+                conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {self._quote(fts + suffix)}")
+            conn.exec_driver_sql(f"DROP TABLE IF EXISTS {self._quote(fts)}")
+        return True
+
+    def search(self, table_name, q, limit=None, columns=None):
+        """
+        search a table with its search index
+
+        parameters:
+            table_name: str|enum
+            q: str, FTS5 query e.g. ``"smith"``, ``"smi*"``, ``"col3: smith AND NOT john"``
+            limit: int, default None
+            columns: list, default None, columns to return (all columns if None)
+
+        returns:
+            DataFrame of matching records ranked by bm25 (``bm25`` column, lower is better)
+        """
+        if isinstance(table_name, enum.Enum):
+            table_name = table_name.name
+
+        if not self.search_index_exists(table_name):
+            raise Exception(f"{table_name} has no search index! Please build_search_index()")
+
+        fts = self._fts_name(table_name)
+        q_tbl, q_fts = self._quote(table_name), self._quote(fts)
+        if columns is None:
+            select = f"{q_tbl}.*"
+        else:
+            columns = [columns] if isinstance(columns, str) else list(columns)
+            select = ", ".join(f"{q_tbl}.{self._quote(col)}" for col in columns)
+
+        sql = (
+            f"SELECT {select}, bm25({q_fts}) AS bm25 FROM {q_fts} "
+            f"JOIN {q_tbl} ON {q_tbl}.rowid = {q_fts}.rowid "
+            f"WHERE {q_fts} MATCH :q ORDER BY bm25"
+        )
+        if isinstance(limit, int):
+            sql += f" LIMIT {limit}"
+
+        return pd.read_sql(sa.text(sql), con=self.engine, params={"q": q})
@@ -4,21 +4,76 @@ sqlite helper methods
 
 
 import enum
+import logging
 from pathlib import Path, PosixPath, WindowsPath
 from typing import Union
 
 import pandas as pd
 import sqlalchemy as sa
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from typeguard import typechecked
 
 from ozcore import core
 
-from .orm import ORM
+from .analytic import Analytic
+from .backup import Backup
+from .cache import ResultCache
+from .concurrency import Concurrency, write_transaction
+from .engine import get_engine
+from .json1 import Json
+from .lazy import Lazy
+from .memory import Memory
+from .native import read_native
+from .orm import ORM, df_records
+from .parallel import Parallel
+from .profiler import QueryProfiler
+from .ranking import Ranking
+from .reconcile import Reconcile
+from .schema import cast_dtypes, schema_cache
+from .search import Search
+from .sync import Sync
+from .watermark import Watermark
+from .writequeue import WriteQueue
+
+
+def sa_type(dtype):
+    """
+    Sqlalchemy type of a pandas dtype
 
+    parameters:
+        dtype: pandas or numpy dtype
 
-class Sqlite(ORM):
+    returns:
+        Sqlalchemy type class, Text if no better match
+    """
+    if pd.api.types.is_bool_dtype(dtype):
+        return sa.Boolean
+    elif pd.api.types.is_integer_dtype(dtype):
+        return sa.Integer
+    elif pd.api.types.is_float_dtype(dtype):
+        return sa.Float
+    elif pd.api.types.is_datetime64_any_dtype(dtype):
+        return sa.DateTime
+    return sa.Text
+
+
+class Sqlite(
+    ORM,
+    Watermark,
+    Search,
+    Parallel,
+    Backup,
+    Memory,
+    Sync,
+    Analytic,
+    Lazy,
+    Reconcile,
+    Ranking,
+    Json,
+):
     """
-    Sqlite helper methods using ``ORM`` class
+    Sqlite helper methods using ``ORM``, ``Watermark``, ``Search``, ``Parallel``, ``Backup``, ``Memory``, ``Sync``, ``Analytic``,
+    ``Lazy``, ``Reconcile``, ``Ranking`` and ``Json`` classes
 
     Set the engine before using or if .db is in the current folder, creates the engine automatically
 
@@ -36,28 +91,53 @@ class Sqlite(ORM):
 
         sql.read(table_name, engine, limit=100)
 
+        # tuned connections, see engine.PROFILES
+        sql = core.sql(path_to_database, profile="fast-read")
+
+        # many writers on the same file, see enable_concurrency()
+        sql = core.sql(path_to_database, busy_timeout=5000)
+
     """
 
     DB_EXTENTIONS = ["db", "sqlite", "sqlite3"]
+    WRITE_MODES = ["append", "replace", "upsert"]
+    READ_ENGINES = ["sqlalchemy", "native"]
 
-    def __init__(self, path: Union[str, PosixPath, WindowsPath]):
-        self.engine = self.create_engine(path)
+    def __init__(
+        self, path: Union[str, PosixPath, WindowsPath], profile=None, busy_timeout=None
+    ):
+        self.profile = profile
+        self.concurrency = None  # see enable_concurrency()
+        if busy_timeout is not None:
+            self.concurrency = Concurrency(busy_timeout)
+        self.engine = self.create_engine(path, profile, busy_timeout)
         self.tables_list = []
         self.columns_list = {}
+        self.cache = None  # see enable_cache()
+        self.profiler = None  # see enable_profiler()
 
     @typechecked
-    def create_engine(self, path: Union[str, PosixPath, WindowsPath]):
+    def create_engine(
+        self,
+        path: Union[str, PosixPath, WindowsPath],
+        profile: Union[str, dict, None] = None,
+        busy_timeout: Union[int, None] = None,
+    ):
         """
         Creates an engine.
 
         parameters:
             path: str | posixpath, path to the sqlite db
+            profile: str|dict, default None, PRAGMA profile: "safe", "fast-read", "bulk-load" or a dict of PRAGMAs
+            busy_timeout: int, default None, ms to wait for locks, writers begin with ``BEGIN IMMEDIATE``
 
         returns:
             Engine object
 
         note:
-            Allowed extensions: "db","sqlite","sqlite3"
+            * Allowed extensions: "db","sqlite","sqlite3"
+            * Engines are reused for the same resolved path and profile, so they share one pool
+            * PRAGMAs are applied on each new connection with a connect-event listener
         """
 
         path = core.folder.check_path(path, is_file=True)
@@ -67,7 +147,7 @@ class Sqlite(ORM):
                 f"This is not a valid Sqlite file! Allowed extentions: \n{self.DB_EXTENTIONS}"
             )
 
-        return sa.create_engine("sqlite:///" + str(path), echo=False)
+        return get_engine(path, profile, busy_timeout)
 
     @typechecked
     def set_engine(
@@ -99,16 +179,45 @@ class Sqlite(ORM):
 
         """
 
+        if self.in_memory:
+            raise Exception("Database is loaded into memory! Please unload() first")
+
         if isinstance(engine, sa.engine.Engine):
             engine = engine
 
         else:
-            engine = self.create_engine(engine)
+            busy_timeout = self.concurrency.busy_timeout if self.concurrency else None
+            engine = self.create_engine(engine, self.profile, busy_timeout)
 
-        self.engine = engine
+        self._swap_engine(engine)
+        if self.cache is not None:
+            self.enable_cache(self.cache.max_bytes)
         if return_engine:
             return engine
 
+    def _swap_engine(self, engine):
+        """
+        use engine from now on, an active profiler follows it
+
+        parameters:
+            engine: Sqlalchemy Engine
+        """
+        self.engine = engine
+        if self.profiler is not None and self.profiler.active:
+            self.profiler.stop()
+            self.profiler.engine = engine
+            self.profiler.start()
+
+    @property
+    def schema(self):
+        """
+        schema cache of the current engine
+
+        returns:
+            SchemaCache, revalidated with ``PRAGMA schema_version`` on each use
+        """
+        return schema_cache(self.engine)
+
     @property
     def tables(self):
         """
@@ -121,9 +230,11 @@ class Sqlite(ORM):
         usage::
 
             core.sql.tables.table_name
+
+        note:
+            tables are served from the schema cache until the schema changes
         """
-        tables = sa.inspect(self.engine).get_table_names()
-        en = enum.IntEnum("tables", tables)
+        en = self.schema.tables
         self.tables_list = [e.name for e in en]
         return en
 
@@ -138,20 +249,13 @@ class Sqlite(ORM):
             enum columns (.name as str name, .value as sa col object)
             also assigns this query to self.columns_list as a dict
         """
-        engine = self.engine
-
         if isinstance(table_name, enum.Enum):
             table_name = table_name.name
 
         if not self.table_exists(table_name):
             raise Exception("table name not found in the database!")
-        metadata = sa.MetaData()
-        metadata.reflect(engine)
-        cols = [col for col in sa.Table(table_name, metadata).columns]
-        names = [e.name for e in cols]
-        dic = dict(e for e in zip(names, cols))
 
-        en = enum.Enum("columns", dic)
+        en = self.schema.columns(table_name)
         self.columns_list[table_name] = [e.name for e in en]
         return en
 
@@ -193,6 +297,10 @@ class Sqlite(ORM):
         else:
             return False
 
+    def _quote(self, name):
+        """identifier quoted for raw SQL if needed"""
+        return self.engine.dialect.identifier_preparer.quote(name)
+
     @property
     def path_to_database(self):
         """
@@ -201,33 +309,625 @@ class Sqlite(ORM):
         parameters:
             engine
         """
-        return Path(self.engine.url.database)
+        engine = self._disk_engine if self.in_memory else self.engine
+        return Path(engine.url.database)
 
-    def read(self, table_name, limit=None, index_column=None):
+    def read(
+        self,
+        table_name,
+        limit=None,
+        index_column=None,
+        columns=None,
+        where=None,
+        params=None,
+        chunksize=None,
+        engine="sqlalchemy",
+    ):
         """
         read a table
 
         parameters:
             table_name: str
             limit: int, default None
+            index_column: str, default None, column to set as index
+            columns: list, default None, columns to select (all columns if None)
+            where: str, default None, SQL filter with named parameters e.g. ``"col2 > :min"``
+            params: dict, default None, values of the named parameters in where
+            chunksize: int, default None, yield DataFrames of chunksize rows
+            engine: str, default "sqlalchemy", "native" reads on a raw sqlite3 cursor
 
         returns:
-            a dataframe with table results
-        """
-        engine = self.engine
+            * a dataframe with table results
+            * an iterator of dataframes if chunksize is given
 
-        if not isinstance(engine, sa.engine.Engine):
+        usage::
+
+            sql.read("table_name", columns=["col1", "col2"], where="col2 > :min", params={"min": 3})
+
+            for chunk in sql.read("table_name", chunksize=10_000):
+                ...
+
+            sql.read("wide_table", engine="native")
+
+        note:
+            * In chunksize mode rows are streamed from a single cursor, so memory is
+              bounded by the chunk size and not by the table size.
+            * Results are served from memory for repeated reads if enable_cache() is called.
+            * The native engine skips pandas and Sqlalchemy row handling, dtypes are set
+              from the declared column types (see ``schema.sa_dtype``). Run
+              ``benchmarks/sqlite_read.py`` to measure the gain on your tables; building the
+              row tuples in sqlite3 is paid by both engines. In chunksize mode integer and
+              boolean columns are Int64 and boolean in every chunk.
+        """
+        if not isinstance(self.engine, sa.engine.Engine):
             raise Exception("Engine must be set!")
 
+        if engine not in self.READ_ENGINES:
+            raise Exception(f"engine should be one of {self.READ_ENGINES}")
+
         if isinstance(table_name, enum.Enum):
             table_name = table_name.name
 
+        key = None
+        if chunksize is None and self.cache is not None:
+            # looked up first, so a hit touches neither the schema nor the table
+            key = (
+                table_name,
+                limit,
+                index_column,
+                tuple(columns) if isinstance(columns, (list, tuple)) else columns,
+                where,
+                tuple(sorted(params.items())) if params else None,
+                engine,
+            )
+            df = self.cache.get(key)
+            if df is not None:
+                return df
+            token = self.cache.token
+
+        stmt = self._select(table_name, limit, index_column, columns, where)
+
+        if chunksize is not None:
+            if engine == "native":
+                return read_native(
+                    self.engine,
+                    stmt,
+                    params,
+                    self.schema.dtypes(table_name),
+                    index_column,
+                    chunksize,
+                )
+            return self._read_chunks(stmt, params, index_column, chunksize)
+
+        df = self._read_all(table_name, stmt, params, index_column, engine)
+        if key is not None:
+            self.cache.put(key, df, token)
+        return df
+
+    def _read_all(self, table_name, stmt, params, index_column, engine):
+        """
+        read a select statement at once with the given read engine
+
+        returns:
+            DataFrame
+        """
+        if engine == "native":
+            dtypes = self.schema.dtypes(table_name)
+            return read_native(self.engine, stmt, params, dtypes, index_column)
+        return pd.read_sql(stmt, con=self.engine, params=params, index_col=index_column)
+
+    def enable_cache(self, max_bytes: int = 256 * 2**20):
+        """
+        cache the results of ``read`` in memory
+
+        parameters:
+            max_bytes: int, default 256 MiB, memory cap of the cached DataFrames
+
+        returns:
+            ResultCache, also assigned to self.cache
+
+        note:
+            * entries expire on any commit to the database, see ``ResultCache``
+            * chunked reads are never cached
+            * not available in memory mode, commits to the memory database are not watched
+        """
+        if self.in_memory:
+            raise Exception("Database is loaded into memory! Please unload() first")
+        self.disable_cache()
+        self.cache = ResultCache(self.path_to_database, max_bytes=max_bytes)
+        return self.cache
+
+    def disable_cache(self):
+        """
+        drop the result cache
+        """
+        if self.cache is not None:
+            self.cache.close()
+        self.cache = None
+
+    def enable_profiler(self, caller: bool = True, maxlen: int = 100_000):
+        """
+        record statements and transactions of the current engine
+
+        parameters:
+            caller: bool, default True, record the caller of each statement
+            maxlen: int, default 100_000, the most recent statements kept
+
+        returns:
+            QueryProfiler, also assigned to self.profiler
+
+        note:
+            Engines are shared per path, statements of other instances on the same engine are recorded too.
+        """
+        self.disable_profiler()
+        self.profiler = QueryProfiler(self.engine, maxlen=maxlen, caller=caller).start()
+        return self.profiler
+
+    def disable_profiler(self):
+        """
+        detach the profiler, its records are kept in self.profiler
+        """
+        if self.profiler is not None:
+            self.profiler.stop()
+
+    def stats(self, top: int = 20):
+        """
+        top statements by total time, see ``QueryProfiler.stats``
+
+        parameters:
+            top: int, default 20, number of statements, all if None
+
+        returns:
+            DataFrame
+        """
+        if self.profiler is None:
+            raise Exception("No profiler found! Please enable_profiler()")
+        return self.profiler.stats(top=top)
+
+    def enable_concurrency(
+        self,
+        busy_timeout: int = 5000,
+        retries: int = 10,
+        backoff: float = 0.01,
+        max_backoff: float = 1.0,
+    ):
+        """
+        safe writes for many writers (threads or processes) on the same file
+
+        parameters:
+            busy_timeout: int, default 5000, ms sqlite waits for a lock
+            retries: int, default 10, retries of a write transaction's begin after busy_timeout
+            backoff: float, default 0.01, seconds to sleep before the first retry, doubled at each retry
+            max_backoff: float, default 1.0, the longest sleep between retries
+
+        returns:
+            Concurrency, also assigned to self.concurrency, see its metrics
+
+        note:
+            * write transactions begin with ``BEGIN IMMEDIATE`` and are retried with exponential backoff
+            * the file is switched to the WAL journal (persistent) unless the profile sets journal_mode,
+              so the reads every write does first (e.g. the schema check) do not wait for other writers
+        """
+        if self.in_memory:
+            raise Exception("Database is loaded into memory! Please unload() first")
+        self.concurrency = Concurrency(busy_timeout, retries, backoff, max_backoff)
+        self.set_engine(self.create_engine(self.path_to_database, self.profile, busy_timeout))
+        return self.concurrency
+
+    def disable_concurrency(self):
+        """
+        back to sqlite's default transactions
+        """
+        if self.concurrency is None:
+            return
+        self.concurrency = None
+        self.set_engine(self.create_engine(self.path_to_database, self.profile))
+
+    def _begin(self):
+        """
+        a write transaction begun with ``BEGIN IMMEDIATE``, with retries in concurrency mode
+
+        returns:
+            context manager of a Connection, committed on exit, DDL included
+        """
+        if self.concurrency is None:
+            return write_transaction(self.engine)
+        return self.concurrency.begin(self.engine)
+
+    def writer(self, max_batch: int = 1000, max_delay: float = 0.05):
+        """
+        a background writer coalescing queued writes into batched transactions
+
+        parameters:
+            max_batch: int, default 1000, most writes in a transaction
+            max_delay: float, default 0.05, seconds to wait for more writes after the first one
+
+        returns:
+            WriteQueue, close() it or use as a context manager
+
+        usage::
+
+            with sql.writer() as w:
+                # from any number of threads
+                future = w.update("table_name", "col2", "col1", "a", 10)
+                w.insert("table_name", {"col1": "z", "col2": 11})
+        """
+        return WriteQueue(self, max_batch=max_batch, max_delay=max_delay)
+
+    def _select(self, table_name, limit=None, index_column=None, columns=None, where=None):
+        """
+        select statement of a table with optional projection, filter and limit
+
+        parameters:
+            see ``read``
+
+        returns:
+            Sqlalchemy Select object
+        """
         if not self.table_exists(table_name):
             raise Exception("table name not found in the database!")
 
-        sql = "SELECT * from " + table_name
+        if columns is None:
+            stmt = sa.select(sa.text("*")).select_from(sa.table(table_name))
+        else:
+            columns = [columns] if isinstance(columns, str) else list(columns)
+            if index_column is not None and index_column not in columns:
+                columns.insert(0, index_column)
+            existing = self.columns(table_name).__members__
+            missing = [col for col in columns if col not in existing]
+            if missing:
+                raise Exception(f"{missing} not found in {table_name}!")
+            stmt = sa.select(*[sa.column(col) for col in columns]).select_from(
+                sa.table(table_name)
+            )
+
+        if where is not None:
+            # grouped, so the filter holds when more conditions are added
+            stmt = stmt.where(sa.text(f"({where})"))
 
         if isinstance(limit, int):
-            sql += " LIMIT " + str(limit)
+            stmt = stmt.limit(limit)
+
+        return stmt
 
-        return pd.read_sql(sql, con=engine, index_col=index_column)
+    def _read_chunks(self, stmt, params, index_column, chunksize):
+        """
+        stream a select statement as DataFrames
+
+        returns:
+            generator of DataFrames with chunksize rows at most
+        """
+        with self.engine.connect() as conn:
+            conn = conn.execution_options(stream_results=True)
+            yield from pd.read_sql(
+                stmt,
+                con=conn,
+                params=params,
+                index_col=index_column,
+                chunksize=chunksize,
+            )
+
+    def iter_pages(
+        self,
+        table_name,
+        page_size=10_000,
+        key="rowid",
+        columns=None,
+        where=None,
+        params=None,
+        index_column=None,
+    ):
+        """
+        page through a table with keyset pagination
+
+        parameters:
+            table_name: str|enum
+            page_size: int, default 10_000, records per page
+            key: str, default "rowid", a unique column to order and seek pages, records with a NULL key are skipped
+            columns: list, default None, columns to select (all columns if None)
+            where: str, default None, SQL filter with named parameters
+            params: dict, default None, values of the named parameters in where
+            index_column: str, default None, column to set as index
+
+        returns:
+            generator of DataFrames
+
+        usage::
+
+            for page in sql.iter_pages("table_name", page_size=50_000):
+                ...
+
+        note:
+            * each page is sought with ``WHERE key > last ORDER BY key LIMIT page_size``,
+              so a deep page costs the same as the first one if key is indexed
+            * a UNIQUE column may hold many NULLs, which can not be sought, so they are left out
+            * pages are cast to dtypes of the declared column types, see ``schema.sa_dtype``
+        """
+        if isinstance(table_name, enum.Enum):
+            table_name = table_name.name
+
+        stmt = self._select(table_name, None, index_column, columns, where)
+        if not self.index_exists(table_name, key):
+            logging.warning(f"{key} has no index in {table_name}, each page scans the table")
+
+        key_col = sa.column(key)
+        stmt = (
+            stmt.add_columns(key_col.label("_ozcore_key"))
+            .where(key_col.isnot(None))
+            .order_by(key_col)
+            .limit(page_size)
+        )
+        seek = stmt.where(key_col > sa.bindparam("_ozcore_last"))
+        params = dict(params or {})
+        dtypes = self.schema.dtypes(table_name)
+
+        first, last = True, None
+        while True:
+            with self.engine.connect() as conn:
+                if first:
+                    result = conn.execute(stmt, params)
+                else:
+                    result = conn.execute(seek, {**params, "_ozcore_last": last})
+                page = pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+
+            if page.empty:
+                return
+            first, last = False, page["_ozcore_key"].iloc[-1]
+            if hasattr(last, "item"):
+                last = last.item()  # numpy scalar to bind
+            page = cast_dtypes(page.drop(columns="_ozcore_key"), dtypes)
+            if index_column is not None:
+                page = page.set_index(index_column)
+            yield page
+            if len(page) < page_size:
+                return
+
+    def write(
+        self, df, table_name, mode="append", key=None, index=False, chunksize=10_000
+    ):
+        """
+        write a DataFrame into a table
+
+        parameters:
+            df: DataFrame
+            table_name: str|enum
+            mode: str, default "append", one of "append", "replace", "upsert"
+            key: str|list, default None, unique column(s) to match records in upsert mode
+            index: bool, default False, write the index as column(s)
+            chunksize: int, default 10_000, records per executemany batch
+
+        returns:
+            int, number of records written
+
+        usage::
+
+            sql.write(df, "table_name")
+            sql.write(df, "table_name", mode="upsert", key="col1")
+
+        note:
+            * all batches are written in a single transaction
+            * the table is created with types mapped from dtypes if it does not exist
+            * upsert uses ``INSERT ... ON CONFLICT (key) DO UPDATE``, a unique index on key is created if missing
+        """
+        if mode not in self.WRITE_MODES:
+            raise Exception(f"mode should be one of {self.WRITE_MODES}")
+
+        if isinstance(table_name, enum.Enum):
+            table_name = table_name.name
+
+        if index:
+            df = df.reset_index()
+
+        key = [key] if isinstance(key, str) else key
+        if mode == "upsert":
+            if not key:
+                raise Exception("key column(s) should be given for upsert!")
+            if any(col not in df for col in key):
+                raise Exception(f"{key} not found in the DataFrame!")
+
+        columns = [str(col) for col in df.columns]
+        df = df.set_axis(columns, axis=1)
+        tbl = sa.table(table_name, *[sa.column(col) for col in columns])
+
+        stmt = sqlite_insert(tbl).values({col: sa.bindparam(col) for col in columns})
+        if mode == "upsert":
+            stmt = stmt.on_conflict_do_update(
+                index_elements=key,
+                set_={col: stmt.excluded[col] for col in columns if col not in key},
+            )
+        compiled = stmt.compile(dialect=self.engine.dialect)
+        positions = [columns.index(name) for name in compiled.positiontup]
+
+        with self._begin() as conn:
+            if mode == "replace" or not self.table_exists(table_name):
+                self._create_table(conn, table_name, df, replace=mode == "replace")
+            if mode == "upsert":
+                self._create_unique_index(conn, table_name, key)
+
+            for i in range(0, len(df), chunksize):
+                records = df_records(df.iloc[i : i + chunksize])
+                if positions != list(range(len(columns))):
+                    records = [tuple(rec[p] for p in positions) for rec in records]
+                conn.exec_driver_sql(str(compiled), records)
+
+        return len(df)
+
+    def _create_table(self, conn, table_name, df, replace=False):
+        """
+        create a table with types mapped from the DataFrame dtypes
+
+        parameters:
+            conn: Sqlalchemy Connection
+            table_name: str
+            df: DataFrame
+            replace: bool, default False, drop the table first if exists
+        """
+        cols = [sa.Column(col, sa_type(dtype)) for col, dtype in df.dtypes.items()]
+        tbl = sa.Table(table_name, sa.MetaData(), *cols)
+        if replace:
+            tbl.drop(conn, checkfirst=True)
+        tbl.create(conn)
+
+    def _create_unique_index(self, conn, table_name, key):
+        """
+        create a unique index on key columns if not exists
+
+        parameters:
+            conn: Sqlalchemy Connection
+            table_name: str
+            key: list of column names
+        """
+        insp = sa.inspect(conn)
+        uniques = [insp.get_pk_constraint(table_name)["constrained_columns"]]
+        uniques += [ix["column_names"] for ix in insp.get_indexes(table_name) if ix["unique"]]
+        uniques += [uc["column_names"] for uc in insp.get_unique_constraints(table_name)]
+        if sorted(key) in [sorted(cols) for cols in uniques]:
+            return
+
+        tbl = sa.Table(
+            table_name, sa.MetaData(), *[sa.Column(col) for col in key]
+        )
+        name = f"ux_{table_name}_{'_'.join(key)}"
+        sa.Index(name, *[tbl.c[col] for col in key], unique=True).create(conn)
+
+    def list_indexes(self, table_name=None):
+        """
+        indexes in the database or in a table
+
+        parameters:
+            table_name: str|enum, default None, all tables if None
+
+        returns:
+            DataFrame with table, name, columns, unique and origin columns
+
+        note:
+            origin is "c" for CREATE INDEX, "u" for UNIQUE constraint and "pk" for PRIMARY KEY
+        """
+        if isinstance(table_name, enum.Enum):
+            table_name = table_name.name
+
+        if table_name is None:
+            tables = self.schema.table_names
+        elif self.table_exists(table_name):
+            tables = [table_name]
+        else:
+            raise Exception("table name not found in the database!")
+
+        records = []
+        with self.engine.connect() as conn:
+            for tbl in tables:
+                quoted = self._quote(tbl)
+                for ix in conn.exec_driver_sql(f"PRAGMA index_list({quoted})").mappings():
+                    quoted_ix = self._quote(ix["name"])
+                    cols = conn.exec_driver_sql(f"PRAGMA index_info({quoted_ix})")
+                    records.append(
+                        {
+                            "table": tbl,
+                            "name": ix["name"],
+                            "columns": [col[2] for col in cols],
+                            "unique": bool(ix["unique"]),
+                            "origin": ix["origin"],
+                        }
+                    )
+
+        return pd.DataFrame(
+            records, columns=["table", "name", "columns", "unique", "origin"]
+        )
+
+    def index_exists(self, table_name, columns):
+        """
+        checks if an index starts with the given columns
+
+        parameters:
+            table_name: str|enum
+            columns: str|list
+
+        returns:
+            boolean, also True for the rowid or an INTEGER PRIMARY KEY column
+        """
+        if isinstance(table_name, enum.Enum):
+            table_name = table_name.name
+        columns = [columns] if isinstance(columns, str) else list(columns)
+
+        if columns[0].lower() in ("rowid", "_rowid_", "oid"):
+            return True
+
+        pk = self.sa_table(table_name).primary_key.columns
+        if len(pk) == 1:
+            pk = list(pk)[0]
+            if pk.name == columns[0] and isinstance(pk.type, sa.Integer):
+                return True  # rowid alias
+
+        indexes = self.list_indexes(table_name)
+        return any(cols[: len(columns)] == columns for cols in indexes["columns"])
+
+    def create_index(self, table_name, columns, name=None, unique=False):
+        """
+        create an index on a table if not exists
+
+        parameters:
+            table_name: str|enum
+            columns: str|list, column(s) of the index
+            name: str, default None, defaults to ``ix_<table>_<columns>``
+            unique: bool, default False
+
+        returns:
+            str, name of the index
+        """
+        if isinstance(table_name, enum.Enum):
+            table_name = table_name.name
+        columns = [columns] if isinstance(columns, str) else list(columns)
+
+        missing = [col for col in columns if not self.column_exists(table_name, col)]
+        if missing:
+            raise Exception(f"{missing} not found in {table_name}!")
+
+        name = name or f"{'ux' if unique else 'ix'}_{table_name}_{'_'.join(columns)}"
+        tbl = self.sa_table(table_name)
+        ix = sa.Index(name, *[tbl.c[col] for col in columns], unique=unique)
+        with self._begin() as conn:
+            ix.create(conn, checkfirst=True)
+
+        return name
+
+    def drop_index(self, name):
+        """
+        drop an index if exists
+
+        parameters:
+            name: str, name of the index
+
+        returns:
+            True
+        """
+        quoted = self._quote(name)
+        with self._begin() as conn:
+            conn.exec_driver_sql(f"DROP INDEX IF EXISTS {quoted}")
+        return True
+
+    def explain(self, sql, params=None):
+        """
+        query plan of a statement
+
+        parameters:
+            sql: str or Sqlalchemy Select object
+            params: dict, default None, values of the named parameters in sql
+
+        returns:
+            DataFrame of ``EXPLAIN QUERY PLAN`` with id, parent, notused and detail columns
+
+        usage::
+
+            sql.explain("SELECT * FROM table_name WHERE col1 = :val", params={"val": 1})
+        """
+        with self.engine.connect() as conn:
+            if isinstance(sql, str):
+                result = conn.execute(sa.text("EXPLAIN QUERY PLAN " + sql), params or {})
+            else:
+                compiled = sql.compile(dialect=self.engine.dialect)
+                positions = compiled.positiontup or []
+                result = conn.exec_driver_sql(
+                    "EXPLAIN QUERY PLAN " + str(compiled),
+                    tuple(compiled.params[name] for name in positions),
+                )
+            return pd.DataFrame(result.fetchall(), columns=list(result.keys()))
@@ -0,0 +1,144 @@
+""" minimal-diff sync of sqlite tables from DataFrames """
+
+import enum
+
+import numpy as np
+import pandas as pd
+
+from .orm import df_records
+from .schema import cast_dtypes
+
+
+def row_hashes(df: pd.DataFrame, key: list) -> pd.Series:
+    """
+    a hash of each row's non-key values
+
+    parameters:
+        df: DataFrame, values in the same dtypes on both sides of a sync
+        key: list of key columns
+
+    returns:
+        uint64 Series indexed by key
+    """
+    values = df.drop(columns=key)
+    if len(values.columns):
+        hashes = pd.util.hash_pandas_object(values, index=False).to_numpy()
+    else:
+        hashes = np.zeros(len(df), dtype=np.uint64)
+    index = pd.MultiIndex.from_frame(df[key]) if len(key) > 1 else pd.Index(df[key[0]])
+    return pd.Series(hashes, index=index)
+
+
+class Sync:
+    """
+    Keeps a table in sync with a DataFrame by writing only the differences
+
+    Rows on both sides are hashed and matched by key, so unchanged rows are
+    neither bound nor written. Inserts, updates and deletes run in a single
+    transaction.
+
+    usage::
+
+        sql.sync("table_name", df, key="id")
+        # {'inserted': 10, 'updated': 3, 'deleted': 1, 'unchanged': 999986}
+
+    """
+
+    def sync(self, table_name, df, key, delete=True, chunksize=10_000):
+        """
+        apply the inserts, updates and deletes that make a table equal to a DataFrame
+
+        parameters:
+            table_name: str|enum
+            df: DataFrame, columns are a subset of the table columns
+            key: str|list, unique column(s) to match records
+            delete: bool, default True, delete the records which are not in df
+            chunksize: int, default 10_000, records per executemany batch
+
+        returns:
+            dict of inserted, updated, deleted and unchanged record counts
+
+        note:
+            * values are compared in the declared column types, dates as datetimes
+            * table columns missing in df are left as they are
+            * a unique index on key is created if missing
+            * the table is created with ``write`` if it does not exist
+        """
+        if isinstance(table_name, enum.Enum):
+            table_name = table_name.name
+
+        key = [key] if isinstance(key, str) else list(key)
+        df = df.set_axis([str(col) for col in df.columns], axis=1)
+        if any(col not in df for col in key):
+            raise Exception(f"{key} not found in the DataFrame!")
+
+        if not self.table_exists(table_name):
+            n = self.write(df, table_name, mode="upsert", key=key, chunksize=chunksize)
+            return {"inserted": n, "updated": 0, "deleted": 0, "unchanged": 0}
+
+        columns = list(df.columns)
+        missing = [col for col in columns if not self.column_exists(table_name, col)]
+        if missing:
+            raise Exception(f"{missing} not found in {table_name}!")
+
+        dtypes = self.schema.dtypes(table_name)
+        dates = list(df.select_dtypes(include=["datetime", "datetimetz"]).columns)
+        new = row_hashes(self._comparable(df, dtypes, dates), key)
+        if new.index.has_duplicates:
+            raise Exception(f"{key} is not unique in the DataFrame!")
+        old = self.read(table_name, columns=columns, engine="native")
+        old = row_hashes(self._comparable(old, dtypes, dates), key)
+        if old.index.has_duplicates:
+            raise Exception(f"{key} is not unique in {table_name}!")
+
+        exists = new.index.isin(old.index)
+        changed = exists.copy()
+        changed[exists] = (
+            new[exists].to_numpy() != old.reindex(new.index[exists]).to_numpy()
+        )
+        gone = old.index[~old.index.isin(new.index)] if delete else old.index[:0]
+
+        values = [col for col in columns if col not in key]
+        q_tbl = self._quote(table_name)
+        q_cols = ", ".join(self._quote(col) for col in columns)
+        marks = ", ".join("?" for _ in columns)
+        where = " AND ".join(f"{self._quote(col)} = ?" for col in key)
+        sets = ", ".join(f"{self._quote(col)} = ?" for col in values)
+
+        with self._begin() as conn:
+            self._create_unique_index(conn, table_name, key)
+
+            if len(gone):
+                deletes = df_records(gone.to_frame(index=False))
+                self._executemany(conn, f"DELETE FROM {q_tbl} WHERE {where}", deletes, chunksize)
+            if values and changed.any():
+                updates = df_records(df[changed], values + key)
+                self._executemany(conn, f"UPDATE {q_tbl} SET {sets} WHERE {where}", updates, chunksize)
+            if not exists.all():
+                inserts = df_records(df[~exists], columns)
+                self._executemany(
+                    conn, f"INSERT INTO {q_tbl} ({q_cols}) VALUES ({marks})", inserts, chunksize
+                )
+
+        return {
+            "inserted": int((~exists).sum()),
+            "updated": int(changed.sum()),
+            "deleted": len(gone),
+            "unchanged": int((exists & ~changed).sum()),
+        }
+
+    @staticmethod
+    def _comparable(df, dtypes, dates):
+        """values in the declared dtypes, dates as naive datetimes"""
+        df = cast_dtypes(df, {**dtypes, **dict.fromkeys(dates)})
+        for col in dates:
+            values = pd.to_datetime(df[col], format="ISO8601", errors="coerce")
+            if values.dt.tz is not None:
+                values = values.dt.tz_localize(None)
+            df[col] = values
+        return df
+
+    @staticmethod
+    def _executemany(conn, sql, records, chunksize):
+        for i in range(0, len(records), chunksize):
+            conn.exec_driver_sql(sql, records[i : i + chunksize])
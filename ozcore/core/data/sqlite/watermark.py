@@ -0,0 +1,215 @@
+""" incremental watermark reads from sqlite tables """
+
+import enum
+import logging
+
+import pandas as pd
+import sqlalchemy as sa
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+# watermarks are kept in the database itself, next to the tables they refer to
+# value has no declared type, so rowids, numbers and timestamps are stored as they are
+# last_rowid breaks ties of a non-unique column when reads are limited
+WATERMARKS_DDL = """
+CREATE TABLE IF NOT EXISTS _ozcore_watermarks (
+    consumer TEXT,
+    table_name TEXT,
+    column_name TEXT,
+    value,
+    last_rowid INTEGER,
+    updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (consumer, table_name, column_name)
+)
+"""
+WATERMARKS = sa.Table(
+    "_ozcore_watermarks",
+    sa.MetaData(),
+    sa.Column("consumer", sa.Text, primary_key=True),
+    sa.Column("table_name", sa.Text, primary_key=True),
+    sa.Column("column_name", sa.Text, primary_key=True),
+    sa.Column("value", sa.types.NullType),
+    sa.Column("last_rowid", sa.Integer),
+    sa.Column("updated_at", sa.Text, server_default=sa.text("CURRENT_TIMESTAMP")),
+)
+
+
+class Watermark:
+    """
+    Incremental reads of growing tables
+
+    Rows past a watermark (rowid or an increasing column like a timestamp) are
+    read, and the new watermark is stored per consumer in ``_ozcore_watermarks``.
+
+    usage::
+
+        df = sql.read_since("events", "rowid", consumer="my_job")
+        # next poll returns only rows inserted after this read
+
+        # a timestamp in batches, rows sharing a timestamp are sought by rowid
+        df = sql.read_since("events", "created_at", consumer="my_job", limit=10_000)
+
+    """
+
+    def _stored_watermark(self, consumer, table_name, watermark_column):
+        """
+        stored value and last_rowid of a consumer, (None, None) if not stored
+        """
+        if not self.table_exists(WATERMARKS.name):
+            return None, None
+
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                sa.select(WATERMARKS.c.value, WATERMARKS.c.last_rowid).where(
+                    WATERMARKS.c.consumer == consumer,
+                    WATERMARKS.c.table_name == table_name,
+                    WATERMARKS.c.column_name == watermark_column,
+                )
+            ).first()
+        return tuple(row) if row is not None else (None, None)
+
+    def get_watermark(self, consumer, table_name, watermark_column="rowid"):
+        """
+        stored watermark of a consumer
+
+        parameters:
+            consumer: str
+            table_name: str|enum
+            watermark_column: str, default "rowid"
+
+        returns:
+            the stored value or None
+        """
+        if isinstance(table_name, enum.Enum):
+            table_name = table_name.name
+
+        return self._stored_watermark(consumer, table_name, watermark_column)[0]
+
+    def set_watermark(self, consumer, table_name, watermark_column, value, last_rowid=None):
+        """
+        store the watermark of a consumer
+
+        parameters:
+            consumer: str
+            table_name: str|enum
+            watermark_column: str
+            value: the last value read
+            last_rowid: int, default None, rowid of the last row read, see ``read_since``
+
+        returns:
+            True
+        """
+        if isinstance(table_name, enum.Enum):
+            table_name = table_name.name
+
+        stmt = sqlite_insert(WATERMARKS).values(
+            consumer=consumer,
+            table_name=table_name,
+            column_name=watermark_column,
+            value=value,
+            last_rowid=last_rowid,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["consumer", "table_name", "column_name"],
+            set_={
+                "value": stmt.excluded.value,
+                "last_rowid": stmt.excluded.last_rowid,
+                "updated_at": sa.func.current_timestamp(),
+            },
+        )
+        with self._begin() as conn:
+            conn.exec_driver_sql(WATERMARKS_DDL)
+            conn.execute(stmt)
+        return True
+
+    def read_since(
+        self,
+        table_name,
+        watermark_column="rowid",
+        last_value=None,
+        last_rowid=None,
+        consumer=None,
+        columns=None,
+        limit=None,
+        commit=True,
+    ):
+        """
+        read rows past a watermark
+
+        parameters:
+            table_name: str|enum
+            watermark_column: str, default "rowid", an increasing column
+            last_value: default None, read rows greater than this value,
+                if None the stored watermark of the consumer is used, or all rows if none stored
+            last_rowid: int, default None, with limit, rows equal to last_value are read past this rowid
+            consumer: str, default None, name to store the watermark for
+            columns: list, default None, columns to select (all columns if None)
+            limit: int, default None, read at most limit rows, the rest on the next poll
+            commit: bool, default True, store the new watermark of the consumer,
+                if False call ``set_watermark`` after the rows are processed
+
+        returns:
+            DataFrame ordered by watermark_column, ``df.attrs["watermark"]`` has the new watermark
+            and ``df.attrs["watermark_rowid"]`` the rowid of the last row if limit is given
+
+        note:
+            * An index on watermark_column makes a poll cost proportional to the new rows only.
+            * With limit, a non-unique column (a timestamp) is ordered and sought on
+              ``(watermark_column, rowid)``, so rows sharing the last value past the limit are
+              read on the next poll.
+            * Rows with a NULL watermark_column are never read.
+        """
+        if isinstance(table_name, enum.Enum):
+            table_name = table_name.name
+
+        if last_value is None and consumer is not None:
+            last_value, last_rowid = self._stored_watermark(consumer, table_name, watermark_column)
+
+        stmt = self._select(table_name, limit, None, columns)
+        if not self.index_exists(table_name, watermark_column):
+            logging.warning(
+                f"{watermark_column} has no index in {table_name}, each poll scans the table"
+            )
+
+        key_col = sa.column(watermark_column)
+        # a limit may stop inside rows sharing a value, the rowid breaks the tie
+        ties = limit is not None and watermark_column != "rowid"
+        keys = [key_col, sa.column("rowid")] if ties else [key_col]
+        # NULLs can not be sought past, as in iter_pages
+        stmt = (
+            stmt.add_columns(
+                *[col.label(label) for col, label in zip(keys, ["_ozcore_key", "_ozcore_rowid"])]
+            )
+            .where(key_col.isnot(None))
+            .order_by(*keys)
+        )
+        if last_value is not None:
+            last = sa.bindparam("_ozcore_last", last_value)
+            if ties and last_rowid is not None:
+                last_id = sa.bindparam("_ozcore_last_rowid", last_rowid)
+                stmt = stmt.where(sa.tuple_(*keys) > sa.tuple_(last, last_id))
+            else:
+                stmt = stmt.where(key_col > last)
+
+        with self.engine.connect() as conn:
+            result = conn.execute(stmt)
+            df = pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+
+        watermark, watermark_rowid = last_value, last_rowid if ties else None
+        if not df.empty:
+            watermark = df["_ozcore_key"].iloc[-1]
+            if hasattr(watermark, "item"):
+                watermark = watermark.item()  # numpy scalar to bind
+            if ties:
+                watermark_rowid = int(df["_ozcore_rowid"].iloc[-1])
+        df = df.drop(columns=["_ozcore_key", "_ozcore_rowid"], errors="ignore")
+        df.attrs["watermark"] = watermark
+        if ties:
+            df.attrs["watermark_rowid"] = watermark_rowid
+
+        changed = (watermark, watermark_rowid) != (last_value, last_rowid)
+        if consumer is not None and commit and changed:
+            self.set_watermark(
+                consumer, table_name, watermark_column, watermark, last_rowid=watermark_rowid
+            )
+
+        return df
@@ -0,0 +1,233 @@
+""" background write queue coalescing small writes into batched transactions """
+
+import datetime
+import enum
+import itertools
+import queue
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import Future
+
+import numpy as np
+import pandas as pd
+
+from .orm import df_records
+
+# a queued statement, records are bound with executemany
+_Op = namedtuple("_Op", ["sql", "records", "future"])
+_STOP = object()
+
+
+def bind_value(value):
+    """
+    a single value as python object ready to bind
+
+    parameters:
+        value: mixed
+
+    returns:
+        numpy scalars as python objects, NaN as None, datetimes in Sqlalchemy's storage format
+    """
+    if value is None or (np.ndim(value) == 0 and pd.isna(value)):
+        return None
+    if isinstance(value, datetime.datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S.%f")
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+class WriteQueue:
+    """
+    Single background writer for many producers
+
+    Producers queue writes and get a ``Future`` back. The writer thread takes
+    queued writes until max_batch writes or max_delay seconds after the first
+    one, and commits them in one transaction. Consecutive writes of the same
+    statement are bound with a single executemany. Since one thread writes,
+    producers never compete for the sqlite write lock.
+
+    parameters:
+        sqlite: Sqlite instance
+        max_batch: int, default 1000, most writes in a transaction
+        max_delay: float, default 0.05, seconds to wait for more writes after the first one
+
+    usage::
+
+        with sql.writer() as w:
+            futures = [w.update("table_name", "col2", "col1", key, val) for key, val in pairs]
+
+        # all writes are committed when the block exits
+        [f.result() for f in futures]
+
+    note:
+        If a batch fails, its writes are retried one by one, so only the failing
+        writes get the exception in their futures.
+    """
+
+    def __init__(self, sqlite, max_batch: int = 1000, max_delay: float = 0.05):
+        self.sqlite = sqlite
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.batches = 0
+        self.writes = 0
+        self._queue = queue.Queue()
+        self._closed = False
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="ozcore-writer", daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _table_name(self, table_name):
+        return table_name.name if isinstance(table_name, enum.Enum) else table_name
+
+    def _put(self, sql, records) -> Future:
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise Exception("WriteQueue is closed!")
+            self._queue.put(_Op(sql, records, future))
+        return future
+
+    def update(self, table_name, column_name, compare_column, compare_val, val) -> Future:
+        """
+        queue an update of a single record, see ``sa_update_a_record``
+
+        parameters:
+            table_name: str|enum
+            column_name: str
+            compare_column: str, the common unique column to compare record
+            compare_val: mixed, a value to compare in compare_column
+            val: mixed, the new value of the record
+
+        returns:
+            Future, result is True once committed
+        """
+        q = self.sqlite._quote
+        sql = (
+            f"UPDATE {q(self._table_name(table_name))} "
+            f"SET {q(column_name)} = ? WHERE {q(compare_column)} = ?"
+        )
+        return self._put(sql, [(bind_value(val), bind_value(compare_val))])
+
+    def insert(self, table_name, records) -> Future:
+        """
+        queue an insert of records
+
+        parameters:
+            table_name: str|enum
+            records: dict of a single record or DataFrame
+
+        returns:
+            Future, result is True once committed
+        """
+        if isinstance(records, dict):
+            columns = [str(col) for col in records]
+            values = [tuple(bind_value(val) for val in records.values())]
+        else:
+            columns = [str(col) for col in records.columns]
+            values = df_records(records)
+
+        q = self.sqlite._quote
+        sql = (
+            f"INSERT INTO {q(self._table_name(table_name))} "
+            f"({', '.join(q(col) for col in columns)}) VALUES ({', '.join('?' for _ in columns)})"
+        )
+        return self._put(sql, values)
+
+    def execute(self, sql: str, params: tuple = ()) -> Future:
+        """
+        queue a raw statement with ``?`` parameters
+
+        parameters:
+            sql: str
+            params: tuple, default ()
+
+        returns:
+            Future, result is True once committed
+        """
+        return self._put(sql, [tuple(bind_value(val) for val in params)])
+
+    def flush(self, timeout: float = None):
+        """
+        wait until the writes queued so far are committed
+
+        parameters:
+            timeout: float, default None, seconds to wait
+        """
+        self._put(None, []).result(timeout)
+
+    def close(self, wait: bool = True):
+        """
+        write the queued writes and stop the writer thread
+
+        parameters:
+            wait: bool, default True, wait for the thread to finish
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        if wait:
+            self._thread.join()
+
+    def _run(self):
+        stop = False
+        while not stop:
+            op = self._queue.get()
+            if op is _STOP:
+                break
+            batch = [op]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    op = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if op is _STOP:
+                    stop = True
+                    break
+                batch.append(op)
+            self._write(batch)
+
+    def _write(self, batch):
+        ops = [op for op in batch if op.future.set_running_or_notify_cancel()]
+        writes = [op for op in ops if op.sql is not None and op.records]
+        # flush markers and empty inserts
+        others = [op for op in ops if op.sql is None or not op.records]
+        try:
+            self._execute(writes)
+        except Exception:
+            # retry one by one, so that only the failing writes fail
+            for op in writes:
+                try:
+                    self._execute([op])
+                except Exception as e:
+                    op.future.set_exception(e)
+                else:
+                    op.future.set_result(True)
+        else:
+            others = writes + others
+        if writes:
+            self.batches += 1
+            self.writes += len(writes)
+        for op in others:
+            op.future.set_result(True)
+
+    def _execute(self, ops):
+        if not ops:
+            return
+        with self.sqlite._begin() as conn:
+            for sql, group in itertools.groupby(ops, key=lambda op: op.sql):
+                records = [rec for op in group for rec in op.records]
+                conn.exec_driver_sql(sql, records)
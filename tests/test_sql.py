@@ -4,14 +4,19 @@ Tests for sqlite helper classes
 warning:
     Some of the tests depend on ``apps/world/world.db``
 """
+import json
 import os
+import threading
 import pytest
 from pathlib import Path
 import sqlalchemy as sa
 import sqlite3
+import pandas as pd
+import numpy as np
 
 from ozcore import core
 from ozcore.core.data.sqlite.sqlite import Sqlite as SQL # import it separately for fresh instance
+from ozcore.core.data.sqlite.engine import PROFILES
 
 
 class TestBase:
@@ -70,6 +75,35 @@ class TestBase:
         assert str(db_engine.url )== db_path.as_uri().replace("file:/", "sqlite://")
         
         
+    def test_engines_are_reused_per_path_and_profile(self):
+        # GIVEN tmpdir has sample.db file
+        db_path = self.PATH.joinpath("sample.db")
+        # WHEN created twice with the same path, once as str
+        # THEN the same engine should be shared
+        assert core.sql(db_path).engine is core.sql(str(db_path)).engine
+        # WHEN created with a profile
+        # THEN a different engine should be created
+        assert core.sql(db_path).engine is not core.sql(db_path, profile="fast-read").engine
+
+    @pytest.mark.parametrize("profile", [("safe"), ("fast-read"), ("bulk-load")])
+    def test_profile_pragmas_are_applied_on_connect(self, profile):
+        # GIVEN tmpdir has sample.db file
+        sql = core.sql(self.PATH.joinpath("sample.db"), profile=profile)
+        # WHEN pragmas queried from a new connection
+        with sql.engine.connect() as conn:
+            journal_mode = conn.exec_driver_sql("PRAGMA journal_mode").scalar()
+            busy_timeout = conn.exec_driver_sql("PRAGMA busy_timeout").scalar()
+        # THEN they should match the profile
+        assert journal_mode == "wal"
+        assert busy_timeout == PROFILES[profile]["busy_timeout"]
+
+    def test_creating_an_engine_with_an_unknown_profile_error(self):
+        # GIVEN tmpdir has sample.db file
+        # WHEN an unknown profile given
+        # THEN should raise an error
+        with pytest.raises(Exception):
+            core.sql(self.PATH.joinpath("sample.db"), profile="unknown")
+
     def test_creating_an_engine_with_only_a_folder_path_error(self):
         # GIVEN tmpdir has 3 sqlite files with 3 different extentions
         path = self.PATH
@@ -187,6 +221,673 @@ class TestSqlite:
         # THEN they should match
         
         assert all(df.iloc[0:limit] == db)
+
+    def test_reading_a_table_with_projection_and_filter(self, sql):
+        # GIVEN table df1 derived from core.df.dummy.df1
+        df = core.df.dummy.df1
+        # WHEN read only col1 where col2 is greater than 2
+        db = sql.read("df1", columns=["col1"], where="col2 > :min", params={"min": 2})
+        # THEN only the filtered records of col1 should be returned
+        assert list(db.columns) == ["col1"]
+        assert list(db.col1) == list(df.loc[df.col2 > 2, "col1"])
+
+    def test_reading_a_table_in_chunks(self, sql):
+        # GIVEN table df1 with 5 records
+        # WHEN read in chunks of 2
+        chunks = list(sql.read("df1", chunksize=2, index_column="col1"))
+        # THEN should yield 3 chunks which makes the whole table
+        assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+        assert pd.concat(chunks).equals(sql.read("df1", index_column="col1"))
+
+    def test_writing_a_dataframe_as_a_new_table(self, sql):
+        # GIVEN df3 derived from core.df.dummy.df3
+        df = core.df.dummy.df3
+        # WHEN written as a new table
+        n = sql.write(df, "df4")
+        # THEN table should be created with the same records
+        assert n == len(df)
+        assert sql.read("df4").equals(df)
+        # WHEN written again in append mode
+        sql.write(df, "df4", mode="append")
+        # THEN records should be doubled
+        assert len(sql.read("df4")) == 2 * len(df)
+        # WHEN written in replace mode
+        sql.write(df, "df4", mode="replace")
+        # THEN the table should have only the new records
+        assert len(sql.read("df4")) == len(df)
+
+    def test_a_failed_replace_keeps_the_table(self, sql):
+        # GIVEN table df1 derived from core.df.dummy.df1
+        # WHEN replaced with records which can not be bound
+        # THEN should raise an exception
+        with pytest.raises(Exception):
+            sql.write(pd.DataFrame({"col1": ["q"], "col2": [{"a": 1}]}), "df1", mode="replace")
+        # THEN the drop should be rolled back with the inserts
+        assert list(sql.read("df1").col1) == ["a", "b", "c", "d", "e"]
+
+    def test_upserting_a_dataframe(self, sql):
+        # GIVEN table df3 derived from core.df.dummy.df3
+        df = core.df.dummy.df3
+        # WHEN two existing and one new record upserted on col1
+        new = pd.DataFrame({"col1": ["a", "b", "z"], "col2": [10, 11, 12]})
+        sql.write(new, "df3", mode="upsert", key="col1")
+        db = sql.read("df3", index_column="col1")
+        # THEN existing records should be updated and the new record inserted
+        assert len(db) == len(df) + 1
+        assert list(db.loc[["a", "b", "z"], "col2"]) == [10, 11, 12]
+        # THEN columns not given should be kept
+        assert db.loc["a", "col3"] == df.loc[0, "col3"]
+
+    def test_syncing_a_table_from_a_dataframe(self, sql):
+        # GIVEN table df1 derived from core.df.dummy.df1
+        df = core.df.dummy.df1.copy()
+        # WHEN synced with the same records
+        # THEN nothing should be written
+        assert sql.sync("df1", df, key="col1") == {
+            "inserted": 0, "updated": 0, "deleted": 0, "unchanged": 5
+        }
+        # WHEN a record changed, one removed and one added
+        df.loc[1, "col4"] = 1.5
+        df = pd.concat([df.drop(index=3), pd.DataFrame({"col1": ["z"], "col2": [9]})])
+        counts = sql.sync("df1", df, key="col1")
+        # THEN only the differences should be applied
+        assert counts == {"inserted": 1, "updated": 1, "deleted": 1, "unchanged": 3}
+        db = sql.read("df1", index_column="col1")
+        assert list(db.index) == ["a", "b", "c", "e", "z"]
+        assert db.loc["b", "col4"] == 1.5
+        assert db.loc["a", "col5"] == sql.read("df1").col5[0]
+        # WHEN the key is not unique
+        # THEN should rise an exception
+        with pytest.raises(Exception):
+            sql.sync("df1", pd.concat([df, df]), key="col1")
+
+    @pytest.mark.skipif(not core.utils.check_modules("duckdb"), reason="duckdb not installed")
+    def test_analyzing_tables_and_dataframes(self, sql):
+        # GIVEN table df1 and a DataFrame of scores
+        scores = pd.DataFrame({"col1": ["a", "b", "c"], "score": [1, 2, 3]})
+        # WHEN tables aggregated
+        df = sql.analyze("SELECT COUNT(*) AS n, SUM(col2) AS total FROM df1")
+        # THEN should get the aggregates
+        assert df.n[0] == 5 and df.total[0] == 10
+        # WHEN a table joined with a DataFrame and windowed
+        df = sql.analyze(
+            """
+            SELECT col1, score, SUM(score) OVER (ORDER BY col1) AS running
+            FROM df1 JOIN scores USING (col1)
+            WHERE col2 < ? ORDER BY col1
+            """,
+            params=[2],
+            scores=scores,
+        )
+        # THEN only matching records should be returned
+        assert list(df.col1) == ["a", "b"]
+        assert list(df.running) == [1, 3]
+
+    @pytest.mark.skipif(not core.utils.check_modules("duckdb"), reason="duckdb not installed")
+    def test_a_failed_duckdb_extension_load_is_retried_later(self, sql, monkeypatch):
+        import duckdb
+        from ozcore.core.data.sqlite import analytic
+
+        # GIVEN a connection whose extension install fails
+        calls = []
+
+        class Offline:
+            def execute(self, query):
+                calls.append(query)
+                raise duckdb.IOException("Failed to download extension")
+
+        monkeypatch.setattr(analytic, "_EXTENSION_FAILED", None)
+        # WHEN loaded twice within RETRY_AFTER
+        # THEN should fall back without trying again
+        assert not sql._load_extension(Offline())
+        assert not sql._load_extension(Offline())
+        assert len(calls) == 1
+        # WHEN RETRY_AFTER passed
+        # THEN the load should be tried again
+        monkeypatch.setattr(analytic, "RETRY_AFTER", 0)
+        assert not sql._load_extension(Offline())
+        assert len(calls) == 2
+
+    @pytest.mark.skipif(not core.utils.check_modules("ibis"), reason="ibis not installed")
+    def test_lazy_table_expressions(self, sql):
+        # GIVEN a lazy expression of table df1
+        t = sql.table("df1")
+        expr = t.filter(t.col2 > 2).select("col1", "col2")
+        # WHEN executed
+        df = expr.execute()
+        # THEN only the filtered records should be read
+        assert list(df.col1) == ["d", "e"]
+
+    def test_writing_from_many_threads_through_the_writer(self, sql):
+        # GIVEN a writer and 8 producer threads
+        from concurrent.futures import ThreadPoolExecutor
+
+        def produce(i):
+            return [w.update("df1", "col2", "col1", key, i * 100 + j) for j, key in enumerate("abcde")] + [
+                w.insert("df1", {"col1": f"t{i}", "col2": i})
+            ]
+
+        # WHEN each thread queues updates and an insert
+        with sql.writer(max_delay=0.05) as w:
+            with ThreadPoolExecutor(8) as pool:
+                futures = [f for fs in pool.map(produce, range(8)) for f in fs]
+        # THEN all writes should be committed in fewer transactions
+        assert all(f.result() for f in futures)
+        assert w.writes == 48
+        assert w.batches < w.writes
+        assert len(sql.read("df1")) == 13
+        # WHEN a write fails
+        with sql.writer() as w:
+            bad = w.update("df1", "no_column", "col1", "a", 1)
+            good = w.update("df1", "col2", "col1", "a", -1)
+        # THEN only its future should fail
+        with pytest.raises(Exception):
+            bad.result()
+        assert good.result()
+        assert sql.read("df1", where="col1 = 'a'").col2[0] == -1
+        # WHEN closed
+        # THEN should not accept writes
+        with pytest.raises(Exception):
+            w.update("df1", "col2", "col1", "a", 1)
+
+    def test_updating_and_adding_columns_from_another_table(self, sql):
+        # GIVEN tables df1 and df3 with common col1 and a source table
+        src = pd.DataFrame({"col1": ["a", "b", "z"], "col4": [1.5, None, 3.0], "score": [1, 2, 3]})
+        sql.write(src, "src")
+        # WHEN col3 of df1 updated from df3
+        # THEN all records should be updated
+        assert sql.update_column_from("df1", "df3", "col1", "col3") == 5
+        assert sql.read("df1").col3.equals(core.df.dummy.df3.col3)
+        # WHEN col4 updated from a source having NULLs
+        # THEN NULLs should not overwrite
+        assert sql.update_column_from("df1", "src", "col1", "col4") == 1
+        col4 = sql.read("df1", index_column="col1").col4
+        assert col4["a"] == 1.5 and col4["b"] == core.df.dummy.df1.col4[1]
+        # WHEN a column added from the source
+        assert sql.add_column_from("df1", "src", "col1", "score") == 2
+        # THEN matching records should be filled, the rest NULL
+        score = sql.read("df1", index_column="col1", engine="native").score
+        assert score.dtype == "Int64"
+        assert list(score.fillna(0)) == [1, 2, 0, 0, 0]
+        # WHEN added again
+        # THEN should rise an exception
+        with pytest.raises(Exception):
+            sql.add_column_from("df1", "src", "col1", "score")
+
+    def test_a_failed_add_column_from_adds_no_column(self, sql):
+        # GIVEN a source table and a trigger failing any update of df1
+        sql.write(pd.DataFrame({"col1": ["a"], "score": [1]}), "src")
+        with sql.engine.begin() as conn:
+            conn.exec_driver_sql(
+                "CREATE TRIGGER no_update BEFORE UPDATE ON df1 BEGIN SELECT RAISE(ABORT, 'no'); END"
+            )
+        # WHEN a column added from the source
+        # THEN should raise an exception and the ALTER be rolled back
+        with pytest.raises(Exception):
+            sql.add_column_from("df1", "src", "col1", "score")
+        assert not sql.column_exists("df1", "score")
+
+    def test_comparing_two_tables(self, sql):
+        # GIVEN tables df1 and a source table with some common keys
+        sql.write(pd.DataFrame({"col1": ["a", "b", "z"]}), "src")
+        # WHEN compared on col1
+        # THEN records with keys missing on the other side should be returned
+        assert list(sql.compare("df1", "src", "col1", side="left").col1) == ["c", "d", "e"]
+        assert list(sql.compare("df1", "src", "col1", side="right").col1) == ["z"]
+        assert len(sql.compare("df1", "src", "col1")) == 4
+        # WHEN whole records compared
+        # THEN identical tables should match
+        assert sql.compare("df1", "df1").empty
+        assert len(sql.compare("df1", "df3", side="left")) == 5
+
+    def test_pareto_and_ranking_in_database(self, sql):
+        # GIVEN table df3 and its ParetoRanking
+        expected = core.df.paretoranking(core.df.dummy.df3, ["col2", "col4"]).merge_pareto_and_ranking
+        # WHEN pareto computed in the database
+        df = sql.pareto("df3", ["col2", "col4"])
+        # THEN values should match the DataFrame version
+        df = df.set_index("col1").loc[expected.col1]
+        for col in ["col2_pareto", "col2_ranking", "col4_pareto", "col4_ranking"]:
+            assert np.allclose(df[col], expected[col])
+        # WHEN computed by groups
+        sql.write(pd.DataFrame({"g": list("aabb"), "v": [1, 3, 2, 2]}), "grouped")
+        df = sql.pareto("grouped", "v", by="g")
+        # THEN each group should reach 100
+        assert list(df.v_pareto) == [75, 100, 50, 100]
+        assert list(df.v_ranking) == [100, 100 / 3, 100, 100]
+        # WHEN written into a new table
+        # THEN records should not be returned but written
+        assert sql.pareto("df3", "col2", into="df3_pareto") == 5
+        assert "col2_pareto" in sql.read("df3_pareto")
+        with pytest.raises(Exception):
+            sql.pareto("df3", "col2", into="df3_pareto")
+
+    def test_a_failed_pareto_replace_keeps_the_tables(self, sql, monkeypatch):
+        # GIVEN table df3 derived from core.df.dummy.df3 and its pareto table
+        sql.pareto("df3", "col2", into="df3_pareto")
+        # WHEN written into the source table itself
+        # THEN should raise an exception and keep the source table
+        with pytest.raises(Exception):
+            sql.pareto("df3", "col2", into="df3", replace=True)
+        assert len(sql.read("df3")) == 5
+        # WHEN the create fails while replacing
+        monkeypatch.setattr(sql, "pareto_query", lambda *args: "SELECT a_missing_column FROM df3")
+        with pytest.raises(Exception):
+            sql.pareto("df3", "col2", into="df3_pareto", replace=True)
+        # THEN the drop should be rolled back
+        assert "col2_pareto" in sql.read("df3_pareto")
+
+    def test_extracting_json_columns(self, sql):
+        # GIVEN a table with JSON payloads and an invalid one
+        payloads = [
+            {"user": {"id": 1, "name": "ann"}, "items": [{"sku": "x", "qty": 2}, {"sku": "y", "qty": 1}]},
+            {"user": {"id": 2, "name": "bob"}, "items": [{"sku": "z", "qty": 5.5}]},
+        ]
+        df = pd.DataFrame({"id": [1, 2, 3], "payload": [json.dumps(p) for p in payloads] + ["{'a': 1}"]})
+        sql.write(df, "events")
+        # WHEN paths extracted
+        df = sql.json_extract_columns("events", "payload", ["$.user.id", "$.user.name"])
+        # THEN values should be typed columns, NULL for the invalid payload
+        assert list(df.columns) == ["id", "user_id", "user_name"]
+        assert list(df.user_id.iloc[:2]) == [1, 2] and pd.isna(df.user_id[2])
+        assert list(df.user_name.iloc[:2]) == ["ann", "bob"]
+        # WHEN an array joined with json_each
+        df = sql.json_extract_columns(
+            "events", "payload", {"sku": "$.sku", "qty": "$.qty"}, each="$.items", where="t.id < :n", params={"n": 3}
+        )
+        # THEN a record per element should be returned
+        assert list(df.id) == [1, 1, 2]
+        assert list(df.sku) == ["x", "y", "z"]
+        assert df.qty.dtype == "float64"
+
+    def test_writing_while_another_process_holds_the_lock(self, sql, tmpdir):
+        # GIVEN concurrency mode with a short busy timeout
+        path = Path(tmpdir).joinpath("sample.db")
+        sql.enable_concurrency(busy_timeout=50, retries=20, backoff=0.02)
+        # GIVEN another connection holding the write lock for 0.3 seconds
+        other = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        other.execute("BEGIN IMMEDIATE")
+        threading.Timer(0.3, other.commit).start()
+        # WHEN a record updated
+        sql.sa_update_a_record("df1", "col2", "col1", "a", 100)
+        other.close()
+        # THEN it should be written after retries
+        assert sql.read("df1").col2[0] == 100
+        stats = sql.concurrency.metrics
+        assert stats["transactions"] == 1 and stats["retries"] >= 1
+        assert stats["lock_wait"] >= 0.2
+        # WHEN retries are exhausted
+        sql.enable_concurrency(busy_timeout=10, retries=0)
+        other = sqlite3.connect(path, isolation_level=None)
+        other.execute("BEGIN IMMEDIATE")
+        # THEN should rise an exception
+        with pytest.raises(sa.exc.OperationalError):
+            sql.sa_update_a_record("df1", "col2", "col1", "a", 200)
+        other.rollback()
+        other.close()
+        assert sql.concurrency.metrics["failures"] == 1
+
+    def test_many_writers_make_progress(self, tmpdir):
+        # GIVEN 4 writers on the same file in concurrency mode
+        from concurrent.futures import ThreadPoolExecutor
+
+        path = Path(tmpdir).joinpath("sample.db")
+        writers = [core.sql(path, busy_timeout=5000) for _ in range(4)]
+
+        def write(i):
+            for j in range(25):
+                writers[i].sa_update_a_record("df1", "col2", "col1", "abcde"[j % 5], i * 100 + j)
+            return writers[i].concurrency.metrics["transactions"]
+
+        # WHEN they update records at the same time
+        with ThreadPoolExecutor(4) as pool:
+            transactions = list(pool.map(write, range(4)))
+        # THEN every write should be committed
+        assert transactions == [25] * 4
+        # THEN the file should be in WAL, so reads do not wait for writers
+        with writers[0].engine.connect() as conn:
+            assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+
+    def test_creating_listing_and_dropping_an_index(self, sql):
+        # GIVEN table df1 derived from core.df.dummy.df1 without any index
+        assert not sql.index_exists("df1", "col1")
+        # WHEN an index created on col1
+        name = sql.create_index("df1", "col1")
+        # THEN should be listed and used in query plans
+        assert sql.index_exists("df1", "col1")
+        assert name in list(sql.list_indexes("df1").name)
+        plan = sql.explain("SELECT * FROM df1 WHERE col1 = :val", params={"val": "a"})
+        assert plan.detail.str.contains(name).any()
+        # WHEN dropped
+        sql.drop_index(name)
+        # THEN should not be listed
+        assert sql.list_indexes("df1").empty
+
+    def test_explaining_a_select_object(self, sql):
+        # GIVEN a select statement with a bound parameter
+        stmt = sql._select("df1", where="col2 > :min")
+        # WHEN explained
+        plan = sql.explain(stmt.params(min=1))
+        # THEN should return a scan plan
+        assert plan.detail.str.contains("SCAN").any()
+
+    def test_reading_from_the_result_cache(self, sql):
+        # GIVEN result cache enabled
+        cache = sql.enable_cache()
+        # WHEN df1 read twice
+        first = sql.read("df1")
+        second = sql.read("df1")
+        # THEN the second read should be a hit with the same records
+        assert cache.stats["hits"] == 1 and cache.stats["misses"] == 1
+        assert first.equals(second)
+        # WHEN df1 updated from another connection
+        with sqlite3.connect(sql.path_to_database) as conn:
+            conn.execute("UPDATE df1 SET col1 = 'x' WHERE col2 = 0")
+        # THEN the cache should expire and read the new records
+        assert sql.read("df1").loc[0, "col1"] == "x"
+        assert cache.stats["misses"] == 2
+        sql.disable_cache()
+
+    def test_result_cache_hits_issue_no_statements(self, sql):
+        # GIVEN df1 read once into the result cache
+        sql.enable_cache()
+        sql.read("df1", columns=["col1", "col2"])
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        # WHEN read again
+        sa.event.listen(sql.engine, "before_cursor_execute", record)
+        try:
+            sql.read("df1", columns=["col1", "col2"])
+        finally:
+            sa.event.remove(sql.engine, "before_cursor_execute", record)
+        # THEN the engine should not be queried, not even for the schema
+        assert statements == []
+        sql.disable_cache()
+
+    def test_result_cache_evicts_over_memory_cap(self, sql):
+        # GIVEN result cache which can hold only one of df1 reads
+        size = sql.read("df1").memory_usage(deep=True).sum()
+        cache = sql.enable_cache(max_bytes=int(size * 1.5))
+        # WHEN df1 read with two different limits
+        sql.read("df1")
+        sql.read("df1", limit=4)
+        # THEN the first one should be evicted
+        assert cache.stats["evictions"] == 1 and cache.stats["entries"] == 1
+        sql.disable_cache()
+
+    def test_paging_through_a_table_with_keyset_pagination(self, sql):
+        # GIVEN table df1 with 5 records
+        df = core.df.dummy.df1
+        # WHEN paged by 2 records on rowid
+        pages = list(sql.iter_pages("df1", page_size=2))
+        # THEN should yield 3 pages having all records with the same dtypes
+        assert [len(page) for page in pages] == [2, 2, 1]
+        assert len({tuple(page.dtypes) for page in pages}) == 1
+        assert list(pd.concat(pages).col1) == list(df.col1)
+
+    def test_paging_with_a_key_column_and_a_filter(self, sql):
+        # GIVEN table df1 with 5 records
+        # WHEN paged on col1 with an OR filter
+        pages = sql.iter_pages(
+            "df1", page_size=1, key="col1", where="col2 = :a OR col2 = :b", params={"a": 1, "b": 3}
+        )
+        # THEN only the filtered records should be yielded in key order
+        assert [list(page.col1) for page in pages] == [["b"], ["d"]]
+
+    def test_paging_on_a_key_column_having_nulls(self, sql):
+        # GIVEN a table whose unique key column has NULLs
+        sql.write(pd.DataFrame({"k": [None, None, 1, 2], "v": list("xyzw")}), "nulls")
+        # WHEN paged on the key, one record per page
+        pages = list(sql.iter_pages("nulls", page_size=1, key="k"))
+        # THEN records with a NULL key should be skipped, not paged forever
+        assert [list(page.v) for page in pages] == [["z"], ["w"]]
+
+    def test_reading_since_a_stored_watermark(self, sql):
+        # GIVEN table df1 with 5 records
+        # WHEN read since the start by a consumer
+        df = sql.read_since("df1", consumer="job")
+        # THEN all records are read and the watermark stored
+        assert len(df) == 5
+        assert sql.get_watermark("job", "df1") == df.attrs["watermark"] == 5
+        # WHEN polled again without new records
+        # THEN nothing should be read
+        assert sql.read_since("df1", consumer="job").empty
+        # WHEN two records appended
+        sql.write(core.df.dummy.df1.iloc[0:2], "df1")
+        # THEN only the new records should be read
+        assert len(sql.read_since("df1", consumer="job")) == 2
+        # THEN other consumers should have their own watermark
+        assert len(sql.read_since("df1", consumer="another_job")) == 7
+
+    def test_reading_since_a_given_value_of_a_column(self, sql):
+        # GIVEN table df1 with col2 values from 0 to 4
+        # WHEN read since col2 value 2
+        df = sql.read_since("df1", "col2", last_value=2)
+        # THEN only records after 2 should be read
+        assert list(df.col2) == [3, 4]
+        assert df.attrs["watermark"] == 4
+
+    def test_reading_since_a_timestamp_with_a_limit(self, sql):
+        # GIVEN a table whose first three records share a timestamp
+        d1, d2 = pd.Timestamp("2021-01-01"), pd.Timestamp("2021-01-02")
+        sql.write(pd.DataFrame({"ts": [d1, d1, d1, d2], "v": [1, 2, 3, 4]}), "events")
+        # WHEN polled on ts by 2 records
+        polls = [list(sql.read_since("events", "ts", consumer="job", limit=2).v) for _ in range(3)]
+        # THEN records sharing the last timestamp past the limit should not be skipped
+        assert polls == [[1, 2], [3, 4], []]
+        assert pd.Timestamp(sql.get_watermark("job", "events", "ts")) == d2
+
+    def test_reading_since_a_column_having_nulls_with_a_limit(self, sql):
+        # GIVEN a table whose first records have no timestamp
+        sql.write(pd.DataFrame({"ts": [None, None, "2021-01-01", "2021-01-02"], "v": [1, 2, 3, 4]}), "events")
+        # WHEN polled on ts by 2 records
+        polls = [list(sql.read_since("events", "ts", consumer="job", limit=2).v) for _ in range(2)]
+        # THEN records without a timestamp should be skipped, not read on every poll
+        assert polls == [[3, 4], []]
+
+    def test_searching_a_table_with_its_search_index(self, sql):
+        # GIVEN table df1 with person names in col3
+        name = core.df.dummy.df1.loc[2, "col3"]
+        # WHEN search index built on col3 and a last name searched
+        sql.build_search_index("df1", ["col3"])
+        result = sql.search("df1", name.split()[-1])
+        # THEN the record should be found with its bm25 rank
+        assert name in list(result.col3)
+        assert "bm25" in result
+        # WHEN the record updated
+        sql.sa_update_a_record("df1", "col3", "col2", 2, "Somebody Else")
+        # THEN the index should follow the table
+        assert "Somebody Else" in list(sql.search("df1", "somebody").col3)
+        assert name not in list(sql.search("df1", name.split()[-1]).col3)
+        # WHEN dropped
+        sql.drop_search_index("df1")
+        # THEN search should raise an error
+        with pytest.raises(Exception):
+            sql.search("df1", "somebody")
+
+    def test_reading_with_the_native_engine(self, sql):
+        # GIVEN table df1 derived from core.df.dummy.df1
+        # WHEN read with the native and the default engine
+        native = sql.read("df1", engine="native")
+        default = sql.read("df1")
+        # THEN records and dtypes should match
+        assert native.equals(default)
+        # THEN chunks and filters should work as in the default engine
+        chunks = sql.read("df1", engine="native", chunksize=2, where="col2 > :min", params={"min": 0})
+        assert pd.concat(chunks).reset_index(drop=True).equals(
+            default[default.col2 > 0].reset_index(drop=True).astype({"col2": "Int64"})
+        )
+
+    def test_native_chunks_have_the_declared_dtypes(self, sql):
+        # GIVEN an integer column with a NULL in the first records only
+        with sqlite3.connect(sql.path_to_database) as conn:
+            conn.execute("UPDATE df1 SET col2 = NULL WHERE col1 = 'a'")
+        # WHEN read in chunks with the native engine
+        chunks = list(sql.read("df1", engine="native", chunksize=2))
+        # THEN every chunk should have the declared dtype, with or without NULLs
+        assert [str(chunk.col2.dtype) for chunk in chunks] == ["Int64"] * 3
+
+    def test_native_engine_keeps_integers_with_nulls(self, sql):
+        # GIVEN an integer column with a NULL
+        with sqlite3.connect(sql.path_to_database) as conn:
+            conn.execute("UPDATE df1 SET col2 = NULL WHERE col1 = 'a'")
+        # WHEN read with the native engine
+        db = sql.read("df1", engine="native")
+        # THEN col2 should be a nullable integer
+        assert db.col2.dtype == "Int64"
+        assert db.col2.isna().sum() == 1
+
+    def test_reading_many_tables_concurrently(self, sql):
+        # GIVEN tables df1, df2, df3
+        # WHEN all tables read on 3 threads
+        dfs = sql.read_many(max_workers=3)
+        # THEN every table should be read as with read()
+        assert list(dfs) == sql.tables_list
+        for name, df in dfs.items():
+            assert df.equals(sql.read(name))
+
+    def test_reading_many_tables_warns_without_wal(self, sql, tmpdir, caplog):
+        # GIVEN sample.db in the default rollback journal mode
+        # WHEN tables read concurrently
+        # THEN should warn that writers block the readers
+        sql.read_many(["df1"])
+        assert "not WAL" in caplog.text
+        # WHEN read with a WAL profile
+        # THEN no warning
+        caplog.clear()
+        core.sql(Path(tmpdir).joinpath("sample.db"), profile="fast-read").read_many(["df1"])
+        assert "not WAL" not in caplog.text
+
+    def test_reading_many_tables_over_a_memory_budget(self, sql):
+        # GIVEN a budget which can not hold any table
+        # WHEN tables read
+        dfs = sql.read_many(["df1", "df2"], memory_budget=1)
+        # THEN tables should be given as chunks
+        assert pd.concat(list(dfs["df1"]), ignore_index=True).equals(sql.read("df1"))
+
+    def test_backing_up_a_database(self, sql, tmpdir):
+        # GIVEN a backups folder
+        folder = Path(tmpdir).joinpath("backups")
+        folder.mkdir()
+        steps = []
+        # WHEN backed up page by page into the folder
+        dest = sql.backup(folder, pages_per_step=1, sleep=0, progress=lambda r, t: steps.append(r))
+        # THEN the backup should have the same records
+        assert dest.parent == folder and dest.suffix == ".db"
+        assert core.sql(dest).read("df1").equals(sql.read("df1"))
+        # THEN progress should be reported on each step
+        assert len(steps) > 1 and steps[-1] == 0
+        # WHEN backed up again as compressed
+        zipped = sql.backup(folder.joinpath("copy.db"), compress=True)
+        # THEN only the zip file should exist
+        assert zipped.suffix == ".zip" and zipped.exists()
+        assert not folder.joinpath("copy.db").exists()
+
+    def test_working_on_an_in_memory_mirror(self, sql):
+        # GIVEN table df1 loaded into memory
+        sql.load_into_memory()
+        assert sql.in_memory
+        # WHEN the result cache enabled
+        # THEN should raise an exception, commits in memory are not watched
+        with pytest.raises(Exception):
+            sql.enable_cache()
+        # WHEN a record updated
+        sql.sa_update_a_record("df1", "col1", "col2", 0, "x")
+        # THEN memory should have it but not the file
+        assert sql.read("df1").loc[0, "col1"] == "x"
+        with sqlite3.connect(sql.path_to_database) as conn:
+            assert conn.execute("SELECT col1 FROM df1 WHERE col2 = 0").fetchone()[0] == "a"
+        # WHEN flushed and unloaded
+        sql.unload()
+        # THEN the file should have the change
+        assert not sql.in_memory
+        assert sql.read("df1").loc[0, "col1"] == "x"
+
+    def test_using_the_in_memory_mirror_from_threads(self, sql, caplog):
+        # GIVEN df1 loaded into memory and read on a thread pool
+        sql.load_into_memory()
+        sql.read_many(max_workers=3)
+        errors = []
+
+        def read():
+            for _ in range(20):
+                try:
+                    sql.read("df1")
+                except Exception as e:
+                    errors.append(e)
+
+        # WHEN records updated while other threads read
+        readers = [threading.Thread(target=read) for _ in range(3)]
+        for reader in readers:
+            reader.start()
+        for i in range(20):
+            sql.sa_update_a_record("df1", "col2", "col1", "a", i)
+        for reader in readers:
+            reader.join()
+        # THEN no thread should see a locked table
+        assert errors == []
+        # WHEN unloaded
+        sql.unload()
+        # THEN connections of other threads should be closed without errors
+        assert "same thread" not in caplog.text
+        assert sql.read("df1").col2[0] == 19
+
+    def test_profiling_statements(self, sql):
+        # GIVEN profiler enabled
+        profiler = sql.enable_profiler()
+        # WHEN df1 read 3 times and a record updated
+        for _ in range(3):
+            sql.read("df1")
+        sql.sa_update_a_record("df1", "col1", "col2", 0, "x")
+        sql.disable_profiler()
+        # THEN statements should be listed by total time
+        stats = sql.stats(top=None)
+        assert stats.total.is_monotonic_decreasing
+        select = stats.loc[[s for s in stats.index if s.startswith("SELECT *")][0]]
+        assert select["count"] == 3
+        update = stats.loc[[s for s in stats.index if s.startswith("UPDATE")][0]]
+        assert update["rows"] == 1
+        # THEN callers should be this test
+        assert "test_profiling_statements" in select["caller"]
+        # THEN transactions should be counted
+        assert profiler.transactions["commit"] >= 1
+        # WHEN disabled
+        # THEN no more records
+        n = len(profiler.records)
+        sql.read("df1")
+        assert len(profiler.records) == n
+
+    def test_profiling_follows_the_memory_engine(self, sql):
+        # GIVEN profiler enabled
+        profiler = sql.enable_profiler()
+        # WHEN loaded into memory and df1 read
+        sql.load_into_memory()
+        n = len(profiler.records)
+        sql.read("df1")
+        # THEN reads from memory should be recorded
+        assert profiler.engine is sql.engine
+        assert len(profiler.records) > n
+        # WHEN unloaded
+        sql.unload(flush=False)
+        # THEN the profiler should be back on the file engine
+        assert profiler.engine is sql.engine
+        sql.disable_profiler()
+
+    def test_schema_cache_is_reused_until_schema_changes(self, sql):
+        # GIVEN table df1 reflected once
+        tbl = sql.schema.table("df1")
+        # WHEN requested again without any schema change
+        # THEN the same reflected object should be served
+        assert sql.sa_table("df1") is tbl
+        # WHEN a new table created from another connection
+        with sqlite3.connect(sql.path_to_database) as conn:
+            conn.execute("CREATE TABLE df4 (a INTEGER)")
+        # THEN schema_version changes and the cache should see the new table
+        assert sql.table_exists("df4")
+        assert sql.sa_table("df1") is not tbl
         
     
 class TestORM:
@@ -250,6 +951,73 @@ class TestORM:
         assert sql.read("df1").col2.dtype == sa.TEXT
         
         
+    def test_batched_alter_operations_in_a_table(self, sql):
+        # GIVEN table df1 derived from core.df.dummy.df1
+        # WHEN a column added, one dropped and one retyped in a single batch
+        with sql.alter("df1") as t:
+            t.add("a_new_column", sa.INTEGER)
+            t.drop("col4")
+            t.retype("col2", sa.TEXT)
+        # THEN all operations should be applied
+        cols = sql.columns("df1").__members__
+        assert "a_new_column" in cols and "col4" not in cols
+        assert isinstance(sql.sa_column("df1", "col2").type, sa.TEXT)
+        # THEN timing should be recorded
+        assert t.elapsed is not None
+
+    def test_batched_alter_operations_are_validated(self, sql):
+        # GIVEN table df1 derived from core.df.dummy.df1
+        # WHEN a missing column dropped
+        # THEN should raise an exception and nothing applied
+        with pytest.raises(Exception):
+            with sql.alter("df1") as t:
+                t.drop("col4")
+                t.drop("col4")
+        assert "col4" in sql.columns("df1").__members__
+
+    def test_online_retype_copies_in_chunks(self, sql):
+        # GIVEN table df1 derived from core.df.dummy.df1 with an index on col1
+        sql.create_index("df1", "col1")
+        rowids = pd.read_sql("SELECT rowid, col1 FROM df1", con=sql.engine)
+        calls = []
+
+        def progress(copied, total):
+            calls.append((copied, total))
+            if len(calls) == 1:
+                # a write during the copy, to a record already copied
+                with sql.engine.begin() as conn:
+                    conn.exec_driver_sql("UPDATE df1 SET col2 = 10 WHERE col1 = 'a'")
+
+        # WHEN col2 retyped to TEXT online, 2 records per chunk
+        sql.sa_change_column_type("df1", "col2", sa.TEXT, online=True, chunksize=2, progress=progress)
+        # THEN col2 should be TEXT and the write during the copy kept
+        assert isinstance(sql.sa_column("df1", "col2").type, sa.TEXT)
+        db = pd.read_sql("SELECT rowid, col1, col2 FROM df1", con=sql.engine)
+        assert db.col2.tolist() == ["10", "1", "2", "3", "4"]
+        # THEN rowids should be preserved and the index recreated
+        assert db[["rowid", "col1"]].equals(rowids)
+        assert sql.index_exists("df1", "col1")
+        # THEN progress should be called per chunk, no shadow table left
+        assert calls == [(2, 5), (4, 5), (5, 5)]
+        assert sql.tables_list == ["df1", "df2", "df3"]
+
+    def test_online_retype_restores_legacy_alter_table_on_failure(self, sql):
+        # GIVEN the rename of the shadow table fails
+        def fail_rename(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith("ALTER TABLE"):
+                raise sqlite3.OperationalError("rename failed")
+
+        sa.event.listen(sql.engine, "before_cursor_execute", fail_rename)
+        # WHEN col2 retyped to TEXT online
+        try:
+            with pytest.raises(sqlite3.OperationalError):
+                sql.sa_change_column_type("df1", "col2", sa.TEXT, online=True)
+        finally:
+            sa.event.remove(sql.engine, "before_cursor_execute", fail_rename)
+        # THEN the pooled connection should be back to the default pragma
+        with sql.engine.connect() as conn:
+            assert conn.exec_driver_sql("PRAGMA legacy_alter_table").scalar() == 0
+
     def test_sa_table_is_a_table_object(self, sql):
         # GIVEN table df1 derived from core.df.dummy.df1
         # WHEN sa_table requested
@@ -280,4 +1048,37 @@ class TestORM:
         source_df = core.df.dummy.df2
         sql.sa_update_a_column(table_name="df1", column_name="col3", compare_column="col1", source_df=source_df)
         assert sql.read("df1").loc[0,"col3"] == source_df.loc[0, "col3"]
-        
\ No newline at end of file
+
+    def test_bulk_update_matches_row_by_row_update(self, sql):
+        # GIVEN df2 as source having duplicated keys, the last one should win
+        source_df = core.df.dummy.df2.iloc[:, 0:-1]
+        source_df = pd.concat([source_df, source_df.iloc[[0]].assign(col3="last")])
+        # WHEN col3 updated in bulk on df1 and row by row on df3 (same content as df1)
+        sql.sa_update_a_column("df1", "col3", "col1", source_df, bulk=True)
+        sql.sa_update_a_column("df3", "col3", "col1", source_df, bulk=False)
+        # THEN both tables should have the same records
+        assert sql.read("df1").col3.equals(sql.read("df3").col3)
+        assert sql.read("df1").loc[0, "col3"] == "last"
+
+    def test_bulk_update_falls_back_on_old_sqlite(self, sql, monkeypatch):
+        # GIVEN a SQLite version without UPDATE ... FROM
+        monkeypatch.setattr(sqlite3, "sqlite_version_info", (3, 31, 1))
+        def no_update_from(*args):
+            raise sa.exc.OperationalError("UPDATE ... FROM", None, Exception("syntax error"))
+
+        monkeypatch.setattr(sql, "_sa_bulk_update", no_update_from)
+        source_df = core.df.dummy.df2
+        # WHEN updated in bulk
+        sql.sa_update_a_column("df1", "col3", "col1", source_df, bulk=True)
+        # THEN records should be updated row by row
+        assert sql.read("df1").loc[0, "col3"] == source_df.loc[0, "col3"]
+
+    @pytest.mark.parametrize("bulk", [(True), (False)])
+    def test_updating_a_column_with_a_temporary_index(self, sql, bulk):
+        # GIVEN table df1 derived from core.df.dummy.df1 without any index
+        source_df = core.df.dummy.df2
+        # WHEN updated with auto_index
+        sql.sa_update_a_column("df1", "col3", "col1", source_df, bulk=bulk, auto_index=True)
+        # THEN records should be updated and the temporary index dropped
+        assert sql.read("df1").loc[0, "col3"] == source_df.loc[0, "col3"]
+        assert sql.list_indexes("df1").empty